@@ -0,0 +1,56 @@
+"""Cold-start time of the parse-only CLI path, in fresh interpreters.
+Usage: python benchmarks/bench_cold_start.py [runs]; exits non-zero when the median is over
+COLD_START_BUDGET_MS."""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+from repo_paths import SELENA_DIR
+
+CLI = os.path.join(SELENA_DIR, "cli.py")
+COLD_START_BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", "150"))
+HEAVY_MODULES = ("selenium", "pdfplumber", "pytesseract", "PIL", "pypdfium2")
+
+
+def time_startup():
+    start = perf_counter()
+    subprocess.run([sys.executable, CLI, "parse", "--startup-only"], check=True, capture_output=True)
+    return (perf_counter() - start) * 1000
+
+
+def loaded_heavy_modules():
+    """Heavy dependencies the parse-only path drags in; should be empty."""
+    probe = (
+        "import sys, cli\n"
+        "cli.main(['parse', '--startup-only'])\n"
+        "print('loaded:' + ','.join(m for m in %r if m in sys.modules))" % (HEAVY_MODULES,)
+    )
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(CLI))
+    output = subprocess.run(
+        [sys.executable, "-c", probe], check=True, capture_output=True, text=True, env=env
+    ).stdout
+    loaded = output.rsplit("loaded:", 1)[1].strip()
+    return loaded.split(",") if loaded else []
+
+
+def main(runs=10):
+    timings = [time_startup() for _ in range(runs)]
+    result = {
+        "runs": runs,
+        "median_ms": round(statistics.median(timings), 1),
+        "max_ms": round(max(timings), 1),
+        "budget_ms": COLD_START_BUDGET_MS,
+        "heavy_modules_loaded": loaded_heavy_modules(),
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    result = main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
+    if result["median_ms"] > COLD_START_BUDGET_MS or result["heavy_modules_loaded"]:
+        sys.exit(1)
@@ -0,0 +1,270 @@
+"""End-to-end benchmark: synthetic corpus -> parse -> /extract -> upload against a mock portal.
+Every stage reports throughput in JSON so runs can be diffed; a stage whose dependencies are
+missing (Flask, selenium, Chrome) is reported as skipped rather than failing the run.
+Usage: python benchmarks/bench_e2e.py --files 1000 [--uploads 20] [--out results.json]"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from repo_paths import REPO_DIR
+from CommonTypes import Receipt, UploadType
+from mock_portal import MockPortal
+from synthetic_corpus import generate_corpus
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+def accuracy(receipts, expected):
+    """Fraction of the corpus parsed with the amount the generator wrote."""
+    correct = sum(
+        1
+        for path, fields in expected.items()
+        if path in receipts and receipts[path].amount_paise == round(float(fields["amount"]) * 100)
+    )
+    return round(correct / len(expected), 4) if expected else None
+
+
+def private_text_cache():
+    """Point the text cache at a fresh directory, so a stage's cold run really extracts even when
+    an earlier stage or run already saw the same corpus."""
+    cache_dir = Path(tempfile.mkdtemp(prefix="bench_cache_"))
+    os.environ["TEXT_CACHE_PATH"] = str(cache_dir / "text_cache.sqlite")
+    return cache_dir
+
+
+def bench_parse_directory(corpus_dir, expected, workers):
+    from move_chrome import ReceiptManager
+
+    cache_dir = private_text_cache()
+    results = {}
+    # "retuned" starts from an empty receipt cache, as after a regex edit: only the text cache helps.
+    for run, cache_path in (
+        ("cold", cache_dir / "cache.sqlite"),
+        ("warm", cache_dir / "cache.sqlite"),
+        ("retuned", cache_dir / "retuned.sqlite"),
+    ):
+        start = perf_counter()
+        manager = ReceiptManager(corpus_dir, cache_path=cache_path, workers=workers, prewarm=False)
+        elapsed = perf_counter() - start
+        results[run] = {
+            "seconds": round(elapsed, 3),
+            "files_per_second": round(len(expected) / elapsed, 1),
+            "parsed": len(manager.receipts),
+            "failed": len(manager.parse_errors),
+            "accuracy": accuracy(manager.receipts, expected),
+        }
+        manager.cache.close()
+    return results
+
+
+def bench_process_receipts(corpus_dir, requests):
+    import server
+
+    server.directory_indexes.clear()
+    private_text_cache()
+    start = perf_counter()
+    payload, _ = server.process_receipts(corpus_dir)
+    cold = perf_counter() - start
+    warm = []
+    for _ in range(requests):
+        start = perf_counter()
+        server.process_receipts(corpus_dir)
+        warm.append(perf_counter() - start)
+    return {
+        "cold_seconds": round(cold, 3),
+        "records": len(payload["receipts"]),
+        "warm": percentiles(warm),
+    }
+
+
+def bench_extract_endpoint(corpus_dir, requests):
+    import server
+
+    client = server.app.test_client()
+    queries = {
+        "full": {"directory": corpus_dir},
+        "page": {"directory": corpus_dir, "limit": 50},
+        "date_range": {"directory": corpus_dir, "since": "2025-08-02", "until": "2025-08-09"},
+    }
+    results = {}
+    for name, query in queries.items():
+        latencies = []
+        for _ in range(requests):
+            start = perf_counter()
+            response = client.get("/extract", query_string=query)
+            latencies.append(perf_counter() - start)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        results[name] = percentiles(latencies)
+    return results
+
+
+def headless_session(lean):
+    from load_chrome import ChromeSession, build_options, lean_enabled
+
+    if lean:
+        os.environ["CHROME_LEAN"] = "TRUE"
+        os.environ["CHROME_LEAN_PROFILE_PATH"] = tempfile.mkdtemp(prefix="bench_lean_")
+        os.environ.setdefault("CHROME_ALLOWED_HOSTS", "127.0.0.1")
+
+    def options():
+        chrome_options = build_options(tempfile.mkdtemp(prefix="bench_profile_"), "Default")
+        if not lean_enabled():
+            chrome_options.add_argument("--headless=new")
+        return chrome_options
+
+    return ChromeSession(options)
+
+
+def browser_rss_mb(driver):
+    """Resident memory of chromedriver and every Chrome process under it (Linux only)."""
+    try:
+        root = driver.service.process.pid
+        children = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        parent = int(f.read().rsplit(")", 1)[1].split()[1])
+                except OSError:
+                    continue
+                children.setdefault(parent, []).append(int(entry))
+        pids = [root]
+        for pid in pids:
+            pids.extend(children.get(pid, []))
+        pages = 0
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    pages += int(f.read().split()[1])
+            except OSError:
+                pass
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def bench_upload(expected, count, processing_ms, lean):
+    from receipt_uploader import ReceiptUploader, pipelined_uploads
+
+    portal = MockPortal(processing_ms).start()
+    os.environ["PLUXEE_URL"] = f"{portal.base_url}/fuel"
+    os.environ["PLUXEE_MOBILE_URL"] = f"{portal.base_url}/mobile"
+    os.environ["DEBUG"] = "False"
+    os.environ.setdefault("PLUXEE_STATUS_SELECTOR", "#upload-status")
+    # Upload from the generator's expected fields so OCR quality cannot skew upload throughput.
+    receipts = [
+        Receipt(
+            path=path,
+            upload_type=UploadType.mobile if "mobile_number" in fields else UploadType.fuel,
+            amount=fields["amount"],
+            date=fields.get("date"),
+            mobile_number=fields.get("mobile_number"),
+        )
+        for path, fields in list(expected.items())[:count]
+    ]
+    session = headless_session(lean)
+    uploader = ReceiptUploader(session)
+    try:
+        start = perf_counter()
+        session.get()
+        startup = perf_counter() - start
+        start = perf_counter()
+        failures = uploader.upload_batch(receipts)
+        elapsed = perf_counter() - start
+        rss = browser_rss_mb(session.driver)
+    finally:
+        session.quit()
+        portal.stop()
+    steps = {}
+    for _, timings in uploader.step_timings:
+        for name, seconds in timings.items():
+            steps.setdefault(name, []).append(seconds)
+    latencies = [sum(timings.values()) for _, timings in uploader.step_timings]
+    return {
+        "browser_start_seconds": round(startup, 3),
+        "uploaded": sum(1 for error in failures.values() if error is None),
+        "failed": sum(1 for error in failures.values() if error is not None),
+        "claims_received": len(portal.claims),
+        "receipts_per_minute": round(len(receipts) / elapsed * 60, 1) if elapsed else None,
+        "pipelined": pipelined_uploads(),
+        "lean": lean,
+        "browser_rss_mb": rss,
+        "per_receipt": percentiles(latencies) if latencies else None,
+        "steps": {name: percentiles(samples) for name, samples in steps.items()},
+    }
+
+
+def run_stage(results, name, stage, *args):
+    try:
+        # The code under test logs with print(); keep stdout for the JSON report.
+        with contextlib.redirect_stdout(sys.stderr):
+            results[name] = stage(*args)
+    except ImportError as missing:
+        results[name] = {"skipped": f"missing dependency: {missing.name}"}
+    except Exception as stage_error:
+        results[name] = {"error": f"{type(stage_error).__name__}: {stage_error}"}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end parse, extract and upload benchmark.")
+    parser.add_argument("--files", type=int, default=100, help="corpus size (10 to 10000)")
+    parser.add_argument("--jpeg-fraction", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--requests", type=int, default=20, help="requests per /extract query")
+    parser.add_argument("--uploads", type=int, default=10, help="receipts to upload (0 skips it)")
+    parser.add_argument("--processing-ms", type=int, default=200, help="mock portal file processing")
+    parser.add_argument("--lean", action="store_true", help="upload with the CHROME_LEAN profile")
+    parser.add_argument("--corpus", help="reuse or keep the corpus in this directory")
+    parser.add_argument("--out", help="also write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    corpus_dir = os.path.abspath(args.corpus or tempfile.mkdtemp(prefix="bench_corpus_"))
+    start = perf_counter()
+    expected = generate_corpus(corpus_dir, args.files, args.jpeg_fraction)
+    results = {
+        "config": {**vars(args), "corpus": corpus_dir},
+        "environment": {"python": platform.python_version(), "revision": git_revision()},
+        "corpus_seconds": round(perf_counter() - start, 3),
+    }
+    run_stage(results, "parse_directory", bench_parse_directory, corpus_dir, expected, args.workers)
+    run_stage(results, "process_receipts", bench_process_receipts, corpus_dir, args.requests)
+    run_stage(results, "extract_endpoint", bench_extract_endpoint, corpus_dir, args.requests)
+    if args.uploads:
+        run_stage(
+            results, "upload", bench_upload, expected, args.uploads, args.processing_ms, args.lean
+        )
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.out:
+        Path(args.out).write_text(output + "\n")
+    return results
+
+
+if __name__ == "__main__":
+    main()
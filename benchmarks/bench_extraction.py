@@ -0,0 +1,76 @@
+"""Micro-benchmark of the shared extraction engine against the original per-call regexes.
+Usage: python benchmarks/bench_extraction.py [repeats]"""
+
+import json
+import re
+import sys
+from time import perf_counter
+
+import repo_paths  # noqa: F401
+from CommonTypes import ReceiptType
+from extraction import extract_fields
+
+LEGACY_AMOUNT = r"Selected Price\D*(\d+(?:\.\d+)?)"
+LEGACY_ADDRESS = r"([A-Z]{3,9}\s+\d{1,2}(?:st|nd|rd|th)?\s+\d{4},\s*\d{1,2}:\d{2}\s*(?:AM|PM)?)\s+(.*?\d{6}(?:,\s*India)?)\s+(.*?\d{6}(?:,\s*India)?)\s+This document is issued"
+LEGACY_CLEANUP = r"Selected Price\s*[^\w\s]*\s*\d+(?:\.\d+)?\s*"
+
+RECEIPT_TEXT = """Ride Receipt
+Customer Name Someone
+Aug 21st 2025, 9:41 AM
+Selected Price ₹ 142.5 12, Some Road, Andheri East, Mumbai, Maharashtra 400069,
+India
+7, Other Street, Powai, Mumbai, Maharashtra 400076, India
+This document is issued electronically and does not require a signature.
+"""
+
+INVOICE_FILLER = "Item Sep 3 2025, 10:15 PM Tax breakup 18.00 CGST 9.00 SGST 9.00 reference 1234567\n"
+
+
+def legacy_extract(text):
+    fields = {"amount": None, "date": None, "source": None, "destination": None}
+    amount_match = re.search(LEGACY_AMOUNT, text, re.IGNORECASE)
+    if amount_match:
+        fields["amount"] = amount_match.group(1)
+    address_match = re.search(LEGACY_ADDRESS, text, re.IGNORECASE | re.DOTALL)
+    if address_match:
+        fields["date"] = address_match.group(1).replace("\n", " ").strip()
+        source = address_match.group(2).replace("\n", " ").strip()
+        fields["source"] = re.sub(LEGACY_CLEANUP, "", source, flags=re.IGNORECASE).strip()
+        fields["destination"] = address_match.group(3).replace("\n", " ").strip()
+    return fields
+
+
+def corpus():
+    return {
+        "receipt": RECEIPT_TEXT,
+        "invoice_with_footer": INVOICE_FILLER * 40 + RECEIPT_TEXT,
+        "invoice_without_footer": INVOICE_FILLER * 40,
+    }
+
+
+def time_calls(fn, text, repeats):
+    start = perf_counter()
+    for _ in range(repeats):
+        fn(text)
+    return (perf_counter() - start) / repeats * 1e6
+
+
+def main(repeats=200):
+    results = []
+    for name, text in corpus().items():
+        engine = lambda t: extract_fields(ReceiptType.Rapido, t)  # noqa: E731
+        assert engine(text) == legacy_extract(text), f"engine disagrees with legacy on {name}"
+        results.append(
+            {
+                "sample": name,
+                "chars": len(text),
+                "legacy_us": round(time_calls(legacy_extract, text, repeats), 1),
+                "engine_us": round(time_calls(engine, text, repeats), 1),
+            }
+        )
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
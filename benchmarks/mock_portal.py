@@ -0,0 +1,96 @@
+"""Local stand-in for the Pluxee claim forms, for driving ReceiptUploader in benchmarks.
+It has the same element ids the uploader relies on (claim-amount, import-img, submit-claim),
+shows "Processing"/"Processed" after a file is picked and clears the form once a claim is
+posted back, counting the claims it received."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from synthetic_corpus import MOBILE_NUMBERS
+
+PAGE = """<!doctype html>
+<html>
+<head><title>Mock Pluxee {kind} claim</title></head>
+<body>
+<form id="claim-form" onsubmit="return false">
+  <input id="claim-amount" type="number">
+  <input id="import-img" type="file">
+  <div id="upload-status"></div>
+  {numbers}
+  <button id="submit-claim" type="button">Submit claim</button>
+</form>
+<div id="confirmation"></div>
+<script>
+const processingMs = {processing_ms};
+const status = document.getElementById("upload-status");
+document.getElementById("import-img").addEventListener("change", () => {{
+  status.textContent = "Processing file";
+  setTimeout(() => {{
+    status.textContent = "File processed";
+    setTimeout(() => {{ status.textContent = ""; }}, processingMs / 2);
+  }}, processingMs);
+}});
+for (const number of document.querySelectorAll(".mobile-number")) {{
+  number.addEventListener("click", () => number.classList.add("selected"));
+}}
+document.getElementById("submit-claim").addEventListener("click", async () => {{
+  const amount = document.getElementById("claim-amount").value;
+  await fetch("/claims", {{method: "POST", body: "{kind}:" + amount}});
+  document.getElementById("claim-form").reset();
+  document.getElementById("confirmation").textContent = "Claim submitted";
+}});
+</script>
+</body>
+</html>
+"""
+
+
+class MockPortal:
+    def __init__(self, processing_ms=200):
+        self.processing_ms = processing_ms
+        self.claims = []
+        self.lock = threading.Lock()
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                kind = self.path.strip("/").split("?")[0]
+                if kind not in ("fuel", "mobile"):
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.end_headers()
+                self.wfile.write(portal.page(kind).encode())
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+                with portal.lock:
+                    portal.claims.append(body)
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def page(self, kind):
+        numbers = ""
+        if kind == "mobile":
+            numbers = "\n  ".join(f'<div class="mobile-number">{number}</div>' for number in MOBILE_NUMBERS)
+        return PAGE.format(kind=kind, numbers=numbers, processing_ms=self.processing_ms)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
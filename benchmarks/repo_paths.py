@@ -0,0 +1,13 @@
+"""Makes selena/ and server_BETA/ importable from benchmarks/. The benchmarks are run as scripts
+from anywhere, so importing this module first is all they need; no package install is involved."""
+
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SELENA_DIR = os.path.join(REPO_DIR, "selena")
+SERVER_BETA_DIR = os.path.join(REPO_DIR, "server_BETA")
+
+for directory in (SERVER_BETA_DIR, SELENA_DIR):
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
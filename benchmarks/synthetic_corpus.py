@@ -0,0 +1,113 @@
+"""Synthetic receipt corpus for the benchmarks.
+Rapido PDFs are written by hand (one Helvetica text page, no PDF library needed) in the layout the
+extraction engine expects; Mobikwik screenshots are drawn with Pillow. Every file gets a distinct
+amount and date so content hashes and dedup keys never collide, and the expected fields are
+returned so a benchmark can check accuracy as well as speed."""
+
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+MOBILE_NUMBERS = [f"98765432{n:02d}" for n in range(10)]
+START_DATE = datetime(2025, 8, 1, 7, 0)
+
+
+def ordinal(day):
+    if 10 <= day % 100 <= 20:
+        return f"{day}th"
+    return f"{day}{ {1: 'st', 2: 'nd', 3: 'rd'}.get(day % 10, 'th') }"
+
+
+def receipt_date(index):
+    when = START_DATE + timedelta(hours=index)
+    return when, f"{when:%b} {ordinal(when.day)} {when.year}, {when:%-I:%M %p}"
+
+
+def pdf_escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_bytes(lines):
+    """A single-page PDF showing each line of text under the previous one."""
+    stream = "BT /F1 11 Tf 14 TL 40 800 Td " + " T* ".join(f"({pdf_escape(line)}) Tj" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        "/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def rapido_receipt(index):
+    _, date_text = receipt_date(index)
+    amount = f"{60 + index}.{index % 100:02d}"
+    source = f"{index % 97 + 1}, Bench Road, Andheri East, Mumbai, Maharashtra 400069, India"
+    destination = f"{index % 89 + 1}, Sample Street, Powai, Mumbai, Maharashtra 400076, India"
+    lines = [
+        "Ride Receipt",
+        f"Customer Name Bench Rider {index}",
+        date_text,
+        f"Selected Price : {amount} {source}",
+        destination,
+        "This document is issued electronically and does not require a signature.",
+    ]
+    expected = {"amount": amount, "date": date_text, "source": source, "destination": destination}
+    return pdf_bytes(lines), expected
+
+
+def write_mobikwik_screenshot(path, index):
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.load_default(size=44)
+    except TypeError:
+        # Pillow before 10.1 only has the small bitmap font.
+        font = ImageFont.load_default()
+    _, date_text = receipt_date(index)
+    amount = f"{100 + index}.00"
+    mobile_number = MOBILE_NUMBERS[index % len(MOBILE_NUMBERS)]
+    image = Image.new("RGB", (1080, 1400), "white")
+    draw = ImageDraw.Draw(image)
+    for row, line in enumerate(
+        ["Recharge Successful", f"Mobile {mobile_number}", f"Amount {amount}", date_text, f"Txn {index:08d}"]
+    ):
+        draw.text((80, 120 + row * 110), line, fill="black", font=font)
+    image.save(path, "JPEG", quality=85)
+    return {"amount": amount, "mobile_number": mobile_number}
+
+
+def generate_corpus(directory, count, jpeg_fraction=0.2):
+    """Write count receipts into directory. Returns {path: expected fields}."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    jpeg_every = round(1 / jpeg_fraction) if jpeg_fraction else 0
+    expected = {}
+    for index in range(count):
+        if jpeg_every and index % jpeg_every == jpeg_every - 1:
+            path = directory / f"mobikwik_{index:05d}.jpeg"
+            expected[str(path)] = write_mobikwik_screenshot(path, index)
+        else:
+            path = directory / f"rapido_{index:05d}.pdf"
+            data, expected[str(path)] = rapido_receipt(index)
+            path.write_bytes(data)
+    return expected
+
+
+if __name__ == "__main__":
+    import sys
+
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.getcwd(), "synthetic_receipts")
+    files = generate_corpus(target, int(sys.argv[2]) if len(sys.argv) > 2 else 100)
+    print(f"Wrote {len(files)} receipts to {target}")
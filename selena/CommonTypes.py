@@ -1,5 +1,8 @@
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import ROUND_CEILING, Decimal
 from enum import Enum
-import math
+import re
 
 
 class ReceiptType(Enum):
@@ -10,18 +13,70 @@ class UploadType(Enum):
     mobile = "mobile"
     fuel = "fuel"
 
+ORDINAL_SUFFIX_RE = re.compile(r"(?<=\d)(st|nd|rd|th)")
+RECEIPT_DATE_FORMAT = "%b %d %Y, %I:%M %p"
+# Receipt times are local and naive, so timestamps count from a naive epoch rather than UTC.
+EPOCH = datetime(1970, 1, 1)
+
+
+def parse_receipt_date(text):
+    """"Aug 21st 2025, 9:41 AM" -> datetime, or None when the text is missing or unreadable."""
+    if not text:
+        return None
+    try:
+        return datetime.strptime(ORDINAL_SUFFIX_RE.sub("", " ".join(text.split())), RECEIPT_DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+def date_timestamp(when):
+    return (when - EPOCH).total_seconds() if when is not None else None
+
+
+def to_paise(amount):
+    # Rounded up to whole paise, so `amount` rounds up to the same rupee as ceil(amount) did.
+    if amount is None:
+        return None
+    return int(Decimal(str(amount)).scaleb(2).to_integral_value(ROUND_CEILING))
+
+
+@dataclass(frozen=True, slots=True, init=False)
 class Receipt:
+    """One parsed receipt. Immutable and slotted, so thousands of them stay cheap to hold.
+    Amounts are kept in integer paise; `amount` is the whole-rupee figure the portal is given."""
+
+    amount_paise: int | None
+    path: str
+    source: str | None
+    destination: str | None
+    # The date as printed on the receipt, and the same date parsed once here.
+    date: str | None
+    when: datetime | None
+    mobile_number: str | None
+    upload_type: UploadType | None
+
     def __init__(self, amount, path, source=None, destination=None, date=None, mobile_number=None, upload_type=None):
-        self.amount = math.ceil(float(amount)) if amount is not None else None
-        self.path = path
-        self.source = source
-        self.destination = destination
-        self.date = date
-        self.mobile_number = mobile_number
-        self.upload_type = upload_type
+        set_field = object.__setattr__
+        set_field(self, "amount_paise", to_paise(amount))
+        set_field(self, "path", path)
+        set_field(self, "source", source)
+        set_field(self, "destination", destination)
+        set_field(self, "date", date)
+        set_field(self, "when", parse_receipt_date(date))
+        set_field(self, "mobile_number", mobile_number)
+        set_field(self, "upload_type", UploadType(upload_type) if isinstance(upload_type, str) else upload_type)
+
+    @property
+    def amount(self):
+        # Claims are rounded up to the next rupee.
+        return -(-self.amount_paise // 100) if self.amount_paise is not None else None
+
+    @property
+    def timestamp(self):
+        return date_timestamp(self.when)
 
     def __repr__(self):
         return f"Receipt(amount={self.amount}, path='{self.path}', source='{self.source}', destination='{self.destination}', date='{self.date}', mobile_number='{self.mobile_number}', upload_type='{self.upload_type}')"
 
     def __hash__(self):
-        return hash(self.path)
\ No newline at end of file
+        return hash(self.path)
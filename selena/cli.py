@@ -0,0 +1,138 @@
+"""Command line entry point: parse, upload, serve and watch.
+Only the modules a subcommand needs are imported, so `parse` never loads selenium, and the
+startup cost of the parse-only path is measured against COLD_START_BUDGET_MS."""
+
+from time import perf_counter
+
+START = perf_counter()
+
+import argparse  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+from pathlib import Path  # noqa: E402
+
+import setup  # noqa: E402
+
+COLD_START_BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", "150"))
+
+
+def report_startup(label):
+    elapsed_ms = (perf_counter() - START) * 1000
+    status = "within" if elapsed_ms <= COLD_START_BUDGET_MS else "over"
+    print(f"# {label} startup: {elapsed_ms:.0f} ms ({status} the {COLD_START_BUDGET_MS:.0f} ms budget)")
+    return elapsed_ms
+
+
+def receipts_dir(args):
+    directory = args.directory or os.getenv("RECEIPTS_SELENA")
+    if not directory:
+        raise SystemExit("Pass a receipts directory or set RECEIPTS_SELENA")
+    return Path(directory)
+
+
+def parse_command(args):
+    from move_chrome import ReceiptManager
+
+    report_startup("parse")
+    if args.startup_only:
+        return
+    receipt_manager = ReceiptManager(receipts_dir(args), workers=args.workers)
+    for receipt in receipt_manager.receipts.values():
+        print(receipt)
+    print("No of receipts", len(receipt_manager.receipts))
+
+
+def export_command(args):
+    from move_chrome import ReceiptManager
+    from receipt_export import export_receipts
+
+    receipt_manager = ReceiptManager(receipts_dir(args), workers=args.workers)
+    count = export_receipts(args.out, receipt_manager.receipts.values(), receipt_manager.digests)
+    print(f"Exported {count} receipts to {args.out}")
+
+
+def summary_command(args):
+    from receipt_export import totals
+
+    for upload_type, (count, paise) in sorted(totals(args.export, args.since, args.until).items()):
+        print(f"{upload_type}: {count} receipts, {paise / 100:.2f}")
+
+
+def upload_command(args):
+    from main import run_uploads
+    from move_chrome import ReceiptManager
+
+    receipt_manager = ReceiptManager(receipts_dir(args), workers=args.workers)
+    print("No of receipts", len(receipt_manager.receipts))
+    run_uploads(receipt_manager)
+
+
+def serve_command(args):
+    import uvicorn
+
+    server_dir = Path(__file__).resolve().parent.parent / "server"
+    uvicorn.run("main:app", app_dir=str(server_dir), host=args.host, port=args.port, workers=args.workers)
+
+
+def watch_command(args):
+    from watcher import IngestionDaemon
+
+    directories = args.directories or [
+        directory
+        for directory in (os.getenv("RECEIPTS_SELENA"), os.getenv("RECEIPTS_DIRECTORY"))
+        if directory
+    ]
+    if not directories:
+        raise SystemExit("Pass directories to watch or set RECEIPTS_SELENA / RECEIPTS_DIRECTORY")
+    IngestionDaemon(directories).run()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pluxee", description="Parse and upload Pluxee receipts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parse = commands.add_parser("parse", help="parse a receipts directory without opening Chrome")
+    parse.add_argument("directory", nargs="?")
+    parse.add_argument("--workers", type=int, default=None)
+    parse.add_argument(
+        "--startup-only", action="store_true", help="exit after imports and report the startup time"
+    )
+    parse.set_defaults(handler=parse_command)
+
+    upload = commands.add_parser("upload", help="parse a receipts directory and upload it to Pluxee")
+    upload.add_argument("directory", nargs="?")
+    upload.add_argument("--workers", type=int, default=None)
+    upload.set_defaults(handler=upload_command)
+
+    export = commands.add_parser("export", help="parse a receipts directory into a sqlite export")
+    export.add_argument("directory", nargs="?")
+    export.add_argument("--out", default="receipts_export.sqlite")
+    export.add_argument("--workers", type=int, default=None)
+    export.set_defaults(handler=export_command)
+
+    summary = commands.add_parser("summary", help="count and total exported receipts by type")
+    summary.add_argument("export")
+    summary.add_argument("--since", help="ISO date, inclusive")
+    summary.add_argument("--until", help="ISO date, exclusive")
+    summary.set_defaults(handler=summary_command)
+
+    serve = commands.add_parser("serve", help="run the receipts API server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--workers", type=int, default=1)
+    serve.set_defaults(handler=serve_command)
+
+    watch = commands.add_parser("watch", help="parse receipts as they land in a directory")
+    watch.add_argument("directories", nargs="*")
+    watch.set_defaults(handler=watch_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup.load()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
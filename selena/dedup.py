@@ -0,0 +1,39 @@
+"""Duplicate receipt detection.
+Two receipts are duplicates when their files have the same content hash, or when they describe
+the same ride: same amount, pickup time to the minute, and route (Rapido). Mobikwik screenshots
+carry no parsed date or transaction id, so two real recharges of one amount to one number look
+identical; they are only ever matched by content hash.
+Both checks are dictionary lookups, so flagging costs O(1) per receipt."""
+
+from CommonTypes import Receipt, UploadType
+
+
+def semantic_key(receipt: Receipt):
+    if receipt.amount_paise is None:
+        return None
+    if receipt.upload_type == UploadType.mobile:
+        # Needs a transaction id or timestamp from the OCR text before it can be told apart safely.
+        return None
+    # Only trust a date that parsed down to the minute; the raw text alone may be truncated.
+    if receipt.when is None:
+        return None
+    return ("fuel", receipt.amount_paise, receipt.when, receipt.source, receipt.destination)
+
+
+class DedupIndex:
+    def __init__(self):
+        self.by_digest = dict[str, str]()
+        self.by_key = dict[tuple, str]()
+
+    def check(self, receipt: Receipt, digest):
+        """Return the path of the receipt this one duplicates, or register it and return None."""
+        original = self.by_digest.get(digest)
+        key = semantic_key(receipt)
+        if original is None and key is not None:
+            original = self.by_key.get(key)
+        if original is not None:
+            return original
+        self.by_digest[digest] = receipt.path
+        if key is not None:
+            self.by_key[key] = receipt.path
+        return None
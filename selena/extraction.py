@@ -0,0 +1,78 @@
+"""Receipt field-extraction engine shared by selena and server_BETA.
+Patterns are compiled once at import, and a rule table keyed by ReceiptType turns a document's
+text into all of its fields in one call."""
+
+import re
+
+from CommonTypes import ReceiptType
+
+AMOUNT_RE = re.compile(r"Selected Price\D*(\d+(?:\.\d+)?)", re.IGNORECASE)
+FOOTER_RE = re.compile(r"This document is issued", re.IGNORECASE)
+ADDRESS_RE = re.compile(
+    r"([A-Z]{3,9}\s+\d{1,2}(?:st|nd|rd|th)?\s+\d{4},\s*\d{1,2}:\d{2}\s*(?:AM|PM)?)\s+(.*?\d{6}(?:,\s*India)?)\s+(.*?\d{6}(?:,\s*India)?)\s+This document is issued",
+    re.IGNORECASE | re.DOTALL,
+)
+CLEANUP_RE = re.compile(r"Selected Price\s*[^\w\s]*\s*\d+(?:\.\d+)?\s*", re.IGNORECASE)
+
+PHONE_RE = re.compile(r"\b\d{10}\b")
+MOBIKWIK_AMOUNT_RE = re.compile(r"\b\d+\.\d{2}\b")
+
+
+def _clean(value):
+    return value.replace("\n", " ").strip()
+
+
+def extract_rapido(text):
+    fields = {"amount": None, "date": None, "source": None, "destination": None}
+
+    amount_match = AMOUNT_RE.search(text)
+    if amount_match:
+        fields["amount"] = amount_match.group(1)
+
+    # The address block always ends at the footer. Without one the lazy DOTALL scan would retry
+    # from every date-like token to the end of the text, so bail out early and never scan past it.
+    footer_match = FOOTER_RE.search(text)
+    if footer_match is None:
+        return fields
+    address_match = ADDRESS_RE.search(text, 0, footer_match.end())
+    if address_match:
+        fields["date"] = _clean(address_match.group(1))
+        # Clean "Selected Price..." from the source address
+        fields["source"] = CLEANUP_RE.sub("", _clean(address_match.group(2))).strip()
+        fields["destination"] = _clean(address_match.group(3))
+    return fields
+
+
+def extract_mobikwik(text):
+    phone_match = PHONE_RE.search(text)
+    amount_match = MOBIKWIK_AMOUNT_RE.search(text)
+    return {
+        "amount": amount_match.group(0) if amount_match else None,
+        "mobile_number": phone_match.group(0) if phone_match else None,
+    }
+
+
+# Add more receipt types here: the extractor, and the patterns that must all have matched before
+# page-by-page extraction can stop reading.
+RULES = {
+    ReceiptType.Rapido: (extract_rapido, (AMOUNT_RE, FOOTER_RE)),
+    ReceiptType.Mobikwik: (extract_mobikwik, (PHONE_RE, MOBIKWIK_AMOUNT_RE)),
+}
+
+
+def extract_fields(receipt_type, text):
+    extractor, _ = RULES[receipt_type]
+    return extractor(text)
+
+
+def required_patterns(receipt_type):
+    return RULES[receipt_type][1]
+
+
+def rule_patterns(receipt_type):
+    """Pattern sources a receipt type's result depends on, used to version cached results."""
+    patterns = {
+        ReceiptType.Rapido: (AMOUNT_RE, FOOTER_RE, ADDRESS_RE, CLEANUP_RE),
+        ReceiptType.Mobikwik: (PHONE_RE, MOBIKWIK_AMOUNT_RE),
+    }[receipt_type]
+    return tuple(f"{pattern.pattern}/{pattern.flags}" for pattern in patterns)
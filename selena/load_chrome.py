@@ -1,42 +1,313 @@
+"""Lazily created, reusable Chrome sessions.
+Nothing starts at import: the driver is launched on first use (or pre-warmed in the background),
+health-checked before every reuse, and the resolved chromedriver path is cached on disk so later
+runs skip the driver lookup and its network check.
+With CHROME_LEAN=TRUE the browser runs headless on a separate, persistent profile that is kept in
+step with the real profile's session state, with fonts and trackers blocked. CHROME_ALLOWED_HOSTS
+and CHROME_BLOCK_IMAGES=TRUE additionally restrict DNS and images."""
+
+import json
 import os
+import shutil
+import threading
+from pathlib import Path
 
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+DRIVER_PATH_CACHE = Path(
+    os.getenv("CHROMEDRIVER_PATH_CACHE", Path.home() / ".cache" / "pluxee-scripts" / "chromedriver.json")
+)
 
-# Read environment variables
-chrome_profile_path = os.getenv("CHROME_PROFILE_PATH")
-profile_name = os.getenv("PROFILE_NAME")
+LEAN_PROFILE_ROOT = Path(
+    os.getenv("CHROME_LEAN_PROFILE_PATH", Path.home() / ".cache" / "pluxee-scripts" / "lean-profiles")
+)
+# Only what keeps the portal session logged in is copied; caches are rebuilt by the lean profile.
+SESSION_STATE = ("Cookies", "Network", "Local Storage", "Session Storage", "IndexedDB", "Preferences")
+DEFAULT_BLOCKED_URLS = (
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.mp4",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*hotjar.com*",
+    "*clarity.ms*",
+)
+LEAN_ARGUMENTS = (
+    "--window-size=1280,900",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-features=Translate,OptimizationHints,MediaRouter,AutofillServerCommunication",
+    "--mute-audio",
+    "--no-first-run",
+    "--renderer-process-limit=2",
+    "--disk-cache-size=104857600",
+    "--log-level=3",
+)
 
-if not chrome_profile_path:
-    raise ValueError("CHROME_PROFILE_PATH is not set")
-else:
-    print(f"Using Chrome profile path: {chrome_profile_path}")
 
-if not profile_name:
-    raise ValueError("PROFILE_NAME is not set")
-else:
-    print(f"Using Chrome profile name: {profile_name}")
+def lean_enabled():
+    return os.getenv("CHROME_LEAN", "False").upper() == "TRUE"
 
-options = Options()
-# options.add_argument("--user-data-dir=/tmp/selenium-profile")
 
-options.add_argument(f"--user-data-dir={chrome_profile_path}")
-options.add_argument(f"--profile-directory={profile_name}")
-options.add_argument("--disable-extensions")
+def allowed_hosts():
+    """Hosts the lean browser may resolve, from CHROME_ALLOWED_HOSTS (comma separated, wildcards
+    like *.pluxee.in allowed). Empty when unset, which leaves DNS alone: the login and CDN hosts
+    the portal needs cannot be guessed from its URL."""
+    configured = os.getenv("CHROME_ALLOWED_HOSTS", "")
+    return [host.strip() for host in configured.split(",") if host.strip()]
 
 
-service = Service(service_args=["--verbose"], log_output="chromedriver.log")
-service = None
-"""Open a new Chrome window with the specified profile and return the driver instance."""
+def block_images():
+    return os.getenv("CHROME_BLOCK_IMAGES", "False").upper() == "TRUE"
 
 
-def open_new_window():
-    global options, service
-    driver = webdriver.Chrome(options=options, service=service)
-    print("Chrome driver initialized with specified profile.")
-    driver.get("https://www.google.com")
-    return driver
+def newest_mtime(path: Path):
+    """Latest modification time of path or anything under it, or None if it does not exist."""
+    try:
+        newest = path.stat().st_mtime
+    except OSError:
+        return None
+    if path.is_dir():
+        for item in path.rglob("*"):
+            try:
+                newest = max(newest, item.stat().st_mtime)
+            except OSError:
+                continue
+    return newest
+
+
+def refresh_copy(source: Path, target: Path):
+    """Copy source over target when source changed after it; returns whether anything was copied.
+    Once the lean browser has refreshed its own copy, that copy is newer and is left alone."""
+    source_mtime = newest_mtime(source)
+    if source_mtime is None:
+        return False
+    target_mtime = newest_mtime(target)
+    if target_mtime is not None and target_mtime >= source_mtime:
+        return False
+    if target.is_dir():
+        shutil.rmtree(target)
+    if source.is_dir():
+        shutil.copytree(source, target, ignore=shutil.ignore_patterns("*LOCK*"))
+    else:
+        shutil.copy2(source, target)
+    return True
+
+
+def prime_lean_profile(chrome_profile_path, profile_name):
+    """Return the lean user-data dir for a real profile, copying in any of its session state that
+    is newer than the lean copy, so a fresh login in the real profile reaches the lean one.
+    The lean profile persists, so its disk cache and refreshed cookies carry over between runs."""
+    target = LEAN_PROFILE_ROOT / f"{Path(chrome_profile_path).name}-{profile_name}"
+    target_profile = target / "Default"
+    source = Path(chrome_profile_path)
+    target_profile.mkdir(parents=True, exist_ok=True)
+    # Local State holds the key the cookies are encrypted with.
+    copies = [(source / "Local State", target / "Local State")]
+    copies += [(source / profile_name / name, target_profile / name) for name in SESSION_STATE]
+    copied = []
+    for item, destination in copies:
+        try:
+            if refresh_copy(item, destination):
+                copied.append(item.name)
+        except OSError as copy_error:
+            # A running Chrome can hold its files open; the portal then just asks for a login.
+            print(f"Could not copy {item} into the lean profile: {copy_error}")
+    if copied:
+        print(f"Refreshed {', '.join(copied)} in lean Chrome profile at {target}")
+    return target
+
+
+def apply_lean_options(options, headless=True):
+    if headless:
+        options.add_argument("--headless=new")
+    for argument in LEAN_ARGUMENTS:
+        options.add_argument(argument)
+    hosts = allowed_hosts()
+    if hosts:
+        rules = ", ".join(["MAP * ~NOTFOUND", *(f"EXCLUDE {host}" for host in hosts)])
+        options.add_argument(f"--host-resolver-rules={rules}")
+    options.add_experimental_option("excludeSwitches", ["enable-logging"])
+    prefs = {"profile.default_content_setting_values.notifications": 2}
+    if block_images():
+        # Off by default: the claim form previews the uploaded receipt image.
+        prefs["profile.managed_default_content_settings.images"] = 2
+    options.add_experimental_option("prefs", prefs)
+    options.page_load_strategy = "eager"
+    return options
+
+
+def block_requests(driver):
+    """Block fonts, media and trackers by URL pattern (CHROME_BLOCKED_URLS to override)."""
+    configured = os.getenv("CHROME_BLOCKED_URLS")
+    patterns = configured.split(",") if configured else list(DEFAULT_BLOCKED_URLS)
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as cdp_error:
+        print(f"Could not block requests over CDP: {cdp_error}")
+
+
+def build_options(chrome_profile_path=None, profile_name=None):
+    from selenium.webdriver.chrome.options import Options
+
+    # Read environment variables
+    chrome_profile_path = chrome_profile_path or os.getenv("CHROME_PROFILE_PATH")
+    profile_name = profile_name or os.getenv("PROFILE_NAME")
+
+    if not chrome_profile_path:
+        raise ValueError("CHROME_PROFILE_PATH is not set")
+    else:
+        print(f"Using Chrome profile path: {chrome_profile_path}")
+
+    if not profile_name:
+        raise ValueError("PROFILE_NAME is not set")
+    else:
+        print(f"Using Chrome profile name: {profile_name}")
+
+    options = Options()
+    # options.add_argument("--user-data-dir=/tmp/selenium-profile")
+
+    if lean_enabled():
+        options.add_argument(f"--user-data-dir={prime_lean_profile(chrome_profile_path, profile_name)}")
+        options.add_argument("--profile-directory=Default")
+        return apply_lean_options(options)
+
+    options.add_argument(f"--user-data-dir={chrome_profile_path}")
+    options.add_argument(f"--profile-directory={profile_name}")
+    options.add_argument("--disable-extensions")
+    return options
+
+
+def read_cached_chromedriver_path():
+    try:
+        path = json.loads(DRIVER_PATH_CACHE.read_text())["path"]
+    except (OSError, ValueError, KeyError):
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def store_chromedriver_path(path):
+    try:
+        DRIVER_PATH_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        DRIVER_PATH_CACHE.write_text(json.dumps({"path": path}))
+    except OSError as cache_error:
+        print(f"Could not cache chromedriver path: {cache_error}")
+
 
+def cached_chromedriver_path(install=None):
+    """Return the cached chromedriver path, resolving it with install() only when none is cached."""
+    path = read_cached_chromedriver_path()
+    if path is None and install is not None:
+        path = install()
+        store_chromedriver_path(path)
+    return path
 
-driver = open_new_window()
+
+def forget_chromedriver_path():
+    try:
+        DRIVER_PATH_CACHE.unlink()
+    except FileNotFoundError:
+        pass
+    except OSError as cache_error:
+        print(f"Could not clear cached chromedriver path: {cache_error}")
+
+
+def launch_with_cached_driver(launch, install=None):
+    """Return launch(driver_path) using the cached chromedriver. A driver left behind by a Chrome
+    auto-update fails with SessionNotCreatedException; it is then forgotten, resolved again and
+    launch is retried once."""
+    from selenium.common.exceptions import SessionNotCreatedException
+
+    driver_path = cached_chromedriver_path(install)
+    try:
+        return launch(driver_path)
+    except SessionNotCreatedException as session_error:
+        if driver_path is None:
+            raise
+        print(
+            f"Cached chromedriver {driver_path} could not start Chrome, resolving it again: "
+            f"{session_error.msg}"
+        )
+        forget_chromedriver_path()
+        return launch(cached_chromedriver_path(install))
+
+
+class ChromeSession:
+    """One reusable driver. get() relaunches Chrome only if the previous session has died."""
+
+    def __init__(self, options_factory=build_options):
+        self.options_factory = options_factory
+        self.driver = None
+        self.lock = threading.Lock()
+
+    def is_alive(self):
+        if self.driver is None:
+            return False
+        try:
+            self.driver.current_window_handle
+            return True
+        except Exception:
+            return False
+
+    def start(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        def launch(driver_path):
+            # Without a cached path Selenium Manager resolves the driver, which we remember for next time.
+            service = Service(executable_path=driver_path) if driver_path else None
+            driver = webdriver.Chrome(options=self.options_factory(), service=service)
+            if driver_path is None:
+                store_chromedriver_path(driver.service.path)
+            return driver
+
+        driver = launch_with_cached_driver(launch)
+        if lean_enabled():
+            block_requests(driver)
+        print("Chrome driver initialized with specified profile.")
+        return driver
+
+    def get(self):
+        with self.lock:
+            if not self.is_alive():
+                if self.driver is not None:
+                    print("Chrome session is no longer responding, starting a new one.")
+                    self.quit_driver()
+                self.driver = self.start()
+            return self.driver
+
+    def prewarm(self):
+        """Start Chrome in the background so it is ready by the time the first upload needs it."""
+        thread = threading.Thread(target=self.get, daemon=True)
+        thread.start()
+        return thread
+
+    def quit_driver(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+        self.driver = None
+
+    def quit(self):
+        with self.lock:
+            if self.driver is not None:
+                self.quit_driver()
+
+
+default_session = ChromeSession()
+
+
+def get_driver():
+    return default_session.get()
+
+
+def open_new_window():
+    """Open a new Chrome window with the specified profile and return the driver instance."""
+    return ChromeSession().get()
@@ -1,8 +1,11 @@
 import os
 from pathlib import Path
-import setup  # noqa: F401
-import pdb
+import metrics
+import setup
 from move_chrome import ReceiptManager
+from receipt_uploader import ClaimUnconfirmed
+from upload_journal import PARSED, SUBMITTED, UPLOADING, UploadJournal
+from upload_scheduler import UploadScheduler
 
 
 def main():
@@ -12,15 +15,60 @@ def main():
     return receipt_manager
 
 
-if __name__ == "__main__":
-    receipt_manager = main()
-    print("No of receipts", len(receipt_manager.receipts))
+def run_uploads(receipt_manager):
+    """Upload every parsed receipt the journal has not already seen through. Returns worker reports."""
+    journal = UploadJournal()
+    debug = os.getenv("DEBUG", "False").upper() == "TRUE"
+    retry_inflight = os.getenv("RETRY_INFLIGHT", "False").upper() == "TRUE"
+    pending = []
     for receipt in receipt_manager.receipts.values():
+        digest = receipt_manager.digests[receipt.path]
+        if journal.is_finished(digest):
+            print(f"# Skipping {receipt.path}, already {journal.state(digest)}.")
+            metrics.increment("receipts_skipped", reason="finished")
+            continue
+        if journal.state(digest) == UPLOADING and not retry_inflight:
+            metrics.increment("receipts_skipped", reason="inflight")
+            # The last run died mid-upload: the claim may or may not have gone through.
+            print(
+                f"# Skipping {receipt.path}, its last upload did not finish. "
+                "Check the portal, then rerun with RETRY_INFLIGHT=TRUE."
+            )
+            continue
         if receipt.amount is None:
             print(f"# Skipping {receipt.path} due to missing amount.")
+            metrics.increment("receipts_skipped", reason="missing_amount")
             continue
+        journal.record(digest, receipt.path, PARSED)
+        pending.append(receipt)
+
+    def on_start(receipt):
         print(f"# Processing {receipt.path}")
-        receipt_manager.receiptUploader.upload_bill(receipt)
-        if os.getenv("DEBUG", "False").upper() != "TRUE":
+        if not debug:
+            journal.record(receipt_manager.digests[receipt.path], receipt.path, UPLOADING)
+
+    def on_result(receipt, error):
+        if debug:
+            return
+        digest = receipt_manager.digests[receipt.path]
+        # A failed upload stays "uploading": it may have failed after the claim was submitted.
+        if error is None:
+            journal.record(digest, receipt.path, SUBMITTED)
             print(f"rm {receipt.path}")
+        elif isinstance(error, ClaimUnconfirmed):
+            print(f"# Check the portal for {receipt.path} before rerunning with RETRY_INFLIGHT=TRUE.")
+
+    try:
+        return UploadScheduler(on_start=on_start, on_result=on_result).run(pending)
+    finally:
+        journal.close()
+
+
+if __name__ == "__main__":
+    import pdb
+
+    setup.load()
+    receipt_manager = main()
+    print("No of receipts", len(receipt_manager.receipts))
+    run_uploads(receipt_manager)
     pdb.set_trace()
@@ -0,0 +1,180 @@
+"""Lightweight spans, counters and structured logs for the parse and upload paths.
+Off unless METRICS=TRUE: span() then hands back one shared no-op context manager and
+increment() returns after a single flag check, so instrumented code pays almost nothing.
+When on, every span and counter is aggregated in-process for render_prometheus() (served at
+/metrics by both servers) and, with METRICS_LOG set to a path or "-" for stderr, written as
+one JSON object per line. Worker processes keep their own registry; only the process that
+serves /metrics is exported."""
+
+import json
+import os
+import sys
+import threading
+import time
+from time import perf_counter
+
+ENABLED = os.getenv("METRICS", "False").upper() == "TRUE"
+LOG_PATH = os.getenv("METRICS_LOG")
+PREFIX = "pluxee_"
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+lock = threading.Lock()
+counters = {}
+# (name, labels) -> [count, sum, per-bucket counts]
+timings = {}
+log_file = None
+
+
+def configure(enabled=None, log_path=None):
+    """Turn metrics on or off at runtime. Without arguments, re-reads METRICS and METRICS_LOG,
+    for when they were loaded from a config file after this module was imported."""
+    global ENABLED, LOG_PATH, log_file
+    if enabled is None:
+        enabled = os.getenv("METRICS", "False").upper() == "TRUE"
+    if log_path is None:
+        log_path = os.getenv("METRICS_LOG")
+    ENABLED = enabled
+    if log_path != LOG_PATH:
+        LOG_PATH = log_path
+        log_file = None
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def log(record):
+    global log_file
+    if not LOG_PATH:
+        return
+    line = json.dumps({"ts": round(time.time(), 3), **record}, default=str)
+    with lock:
+        if log_file is None:
+            log_file = sys.stderr if LOG_PATH == "-" else open(LOG_PATH, "a", buffering=1)
+        log_file.write(line + "\n")
+
+
+def event(name, **fields):
+    """A structured log line with no aggregate behind it (e.g. why a receipt was skipped)."""
+    if ENABLED:
+        log({"event": name, **fields})
+
+
+def increment(name, amount=1, **labels):
+    if not ENABLED:
+        return
+    key = (name, label_key(labels))
+    with lock:
+        counters[key] = counters.get(key, 0) + amount
+    log({"counter": name, "amount": amount, **labels})
+
+
+def observe(name, seconds, **labels):
+    if not ENABLED:
+        return
+    key = (name, label_key(labels))
+    with lock:
+        timing = timings.get(key)
+        if timing is None:
+            timing = timings[key] = [0, 0.0, [0] * len(BUCKETS)]
+        timing[0] += 1
+        timing[1] += seconds
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                timing[2][index] += 1
+    log({"span": name, "seconds": round(seconds, 6), **labels})
+
+
+class Span:
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        labels = self.labels
+        if exc_type is not None:
+            labels = {**labels, "error": exc_type.__name__}
+        observe(self.name, perf_counter() - self.start, **labels)
+        return False
+
+
+class NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = NoopSpan()
+
+
+def span(name, **labels):
+    """Time a block: `with metrics.span("tesseract", images=16): ...`."""
+    if not ENABLED:
+        return NOOP_SPAN
+    return Span(name, labels)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def render_prometheus():
+    """Everything recorded so far in the Prometheus text exposition format."""
+    with lock:
+        counter_items = sorted(counters.items())
+        timing_items = sorted((key, (t[0], t[1], list(t[2]))) for key, t in timings.items())
+    lines = []
+    seen = set()
+    for (name, labels), value in counter_items:
+        metric = f"{PREFIX}{name}_total"
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{format_labels(labels)} {value}")
+    for (name, labels), (count, total, buckets) in timing_items:
+        metric = f"{PREFIX}{name}_seconds"
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# TYPE {metric} histogram")
+        for bound, bucket_count in zip(BUCKETS, buckets):
+            lines.append(f"{metric}_bucket{format_labels(labels + (('le', bound),))} {bucket_count}")
+        lines.append(f"{metric}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+        lines.append(f"{metric}_sum{format_labels(labels)} {total:.6f}")
+        lines.append(f"{metric}_count{format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def snapshot():
+    """Aggregates as plain data, e.g. for a benchmark's JSON report."""
+    with lock:
+        return {
+            "counters": {
+                f"{name}{format_labels(labels)}": value for (name, labels), value in counters.items()
+            },
+            "spans": {
+                f"{name}{format_labels(labels)}": {"count": t[0], "seconds": round(t[1], 6)}
+                for (name, labels), t in timings.items()
+            },
+        }
+
+
+def reset():
+    with lock:
+        counters.clear()
+        timings.clear()
@@ -1,31 +1,51 @@
-from enum import Enum
+"""Manager class to handle receipt parsing and storage.
+Currently supports Rapido receipts, but can be extended to other types.
+initialization requires the directory path where receipts are stored, and it will automatically parse all PDF receipts in that directory."""
+
 import os
-from time import sleep
-
-import pdfplumber
-from load_chrome import driver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
-from CommonTypes import Receipt, ReceiptType, UploadType
+from time import perf_counter
+
+from CommonTypes import Receipt, ReceiptType
 from pathlib import Path
-import re
 
+import metrics
+import receipt_parsers
 from ocr_parser import mobikwikParser
-
-
-"""Manager class to handle receipt parsing and storage.
-Currently supports Rapido receipts, but can be extended to other types.
-initialization requires the directory path where receipts are stored, and it will automatically parse all PDF receipts in that directory."""
+from dedup import DedupIndex
+from receipt_cache import CACHE_FILENAME, ReceiptCache, cache_path_for, file_digest
+from receipt_parsers import PARSER_VERSIONS, READ_ERROR_PREFIX, parse_paths, parse_workers
 
 
 class ReceiptManager:
-    def __init__(self, receipt_dir):
+    def __init__(self, receipt_dir, cache_path=None, workers=None, prewarm=None):
         self.receipts = dict[str, Receipt]()
-        self.receiptUploader = ReceiptUploader()
+        self.parse_errors = dict[str, str]()
+        # Content hash of every parsed file, keyed like self.receipts.
+        self.digests = dict[str, str]()
+        # Duplicate path -> path of the receipt it duplicates; duplicates are left out of self.receipts.
+        self.duplicates = dict[str, str]()
+        # Files no scanner recognised; they are never hashed or handed to a parser.
+        self.unsupported = list[str]()
+        self.dedup = DedupIndex()
+        self.uploader = None
+        if prewarm is None:
+            prewarm = os.getenv("CHROME_PREWARM", "False").upper() == "TRUE"
+        if prewarm:
+            # Chrome starts up while the directory is being parsed.
+            self.receiptUploader.session.prewarm()
         if not isinstance(receipt_dir, Path):
             receipt_dir = Path(receipt_dir)
-        self.parse_directory(receipt_dir)
+        self.cache = ReceiptCache(cache_path_for(receipt_dir, cache_path))
+        self.parse_directory(receipt_dir, workers)
+
+    @property
+    def receiptUploader(self):
+        # Created on first use so parse-only runs never import selenium.
+        if self.uploader is None:
+            from receipt_uploader import ReceiptUploader
+
+            self.uploader = ReceiptUploader()
+        return self.uploader
 
     def receipt_type_to_parser(self, receipt_type):
         # Add more receipt types and their corresponding parsing functions as needed.
@@ -35,172 +55,85 @@ class ReceiptManager:
         }[receipt_type]
 
     def receipt_type(self, path: Path):
-        suffixMap = {
-            ".pdf": ReceiptType.Rapido,
-            ".jpeg": ReceiptType.Mobikwik,
-        }
-        return suffixMap.get(path.suffix, ReceiptType.Rapido)
+        return receipt_parsers.receipt_type(path)
 
-    def parse_directory(self, receipt_dir):
+    def parse_directory(self, receipt_dir, workers=None):
         # Logic to parse the directory and extract receipt information
-        for p in Path(receipt_dir).glob("*.*"):
+        if workers is None:
+            workers = parse_workers()
+        start = perf_counter()
+        paths = sorted(
+            p for p in Path(receipt_dir).glob("*.*") if not p.name.startswith(CACHE_FILENAME)
+        )
+        parsed = {}
+        misses = {}
+        for p in paths:
             receipt_type = self.receipt_type(p)
-            parser = self.receipt_type_to_parser(receipt_type)
-            receipt = parser(p)
-            if receipt is not None:
-                self.receipts[receipt.path] = receipt
+            if receipt_type is None:
+                print(f"# Skipping {p}: not a supported receipt file.")
+                self.unsupported.append(str(p))
+                continue
+            digest = file_digest(p)
+            self.digests[str(p)] = digest
+            version = PARSER_VERSIONS[receipt_type]
+            receipt = self.cache.get(digest, version, p)
+            if receipt is None:
+                misses[p] = (receipt_type, digest, version)
+            else:
+                parsed[p] = receipt
+
+        metrics.increment("receipts_skipped", len(self.unsupported), reason="unsupported")
+        metrics.increment("cache_hits", len(parsed))
+        metrics.increment("cache_misses", len(misses))
+        jobs = [(receipt_type, p) for p, (receipt_type, _, _) in misses.items()]
+        with metrics.span("parse_paths", workers=workers):
+            results, errors = parse_paths(jobs, workers)
+        for p, (_, digest, version) in misses.items():
+            receipt = results.get(p)
+            if receipt is not None and not str(receipt.source).startswith(READ_ERROR_PREFIX):
+                self.cache.put(digest, version, receipt)
+            parsed[p] = receipt
+        for p, error in errors.items():
+            print(f"# Failed to parse {p}: {error}")
+            metrics.event("parse_failed", path=str(p), error=error)
+            self.parse_errors[str(p)] = error
+        metrics.increment("parse_failures", len(errors))
+
+        # Insert in path order so the mapping is identical whichever mode produced it, and so the
+        # first of a set of duplicates is always the one kept.
+        for p in paths:
+            receipt = parsed.get(p)
+            if receipt is None:
+                continue
+            original = self.dedup.check(receipt, self.digests[receipt.path])
+            if original is not None:
+                print(f"# Duplicate {receipt.path} of {original}, not uploading it.")
+                metrics.increment("receipts_skipped", reason="duplicate")
+                self.duplicates[receipt.path] = original
+                continue
+            self.receipts[receipt.path] = receipt
+        elapsed = perf_counter() - start
+        metrics.observe("parse_directory", elapsed)
+        print(
+            f"Parsed {len(paths) - len(self.unsupported)} files ({len(jobs)} uncached, "
+            f"{len(errors)} failed, {len(self.unsupported)} unsupported) "
+            f"with {workers} worker(s) in {elapsed:.2f}s"
+        )
 
     def parseRapidoReceipt(self, path: Path):
-        # Logic to parse a Rapido receipt and extract information
-        assert path.suffix == ".pdf", "Expected a PDF file"
-
-        amount = None
-        date = None
-        date = None
-        source = None
-        destination = None
-
-        try:
-            with pdfplumber.open(path) as pdf:
-                document_text = ""
-                for page in pdf.pages:
-                    extracted = page.extract_text()
-                    if extracted:
-                        document_text += extracted + "\n"
-
-                # forbidden_phrases = ["421203"]
-                # if any(phrase in document_text for phrase in forbidden_phrases):
-                #     print(f"Skipping {path.name} due to presence of forbidden phrases.")
-                #     return None
-
-                # Extract Amount
-                amount_match = re.search(
-                    r"Selected Price\D*(\d+(?:\.\d+)?)",
-                    document_text,
-                    re.IGNORECASE,
-                )
-                if amount_match:
-                    amount = amount_match.group(1)
-
-                # Extract Date, Source, and Destination
-                address_pattern = r"([A-Z]{3,9}\s+\d{1,2}(?:st|nd|rd|th)?\s+\d{4},\s*\d{1,2}:\d{2}\s*(?:AM|PM)?)\s+(.*?\d{6}(?:,\s*India)?)\s+(.*?\d{6}(?:,\s*India)?)\s+This document is issued"
-                # Extract Date, Source, and Destination
-                address_pattern = r"([A-Z]{3,9}\s+\d{1,2}(?:st|nd|rd|th)?\s+\d{4},\s*\d{1,2}:\d{2}\s*(?:AM|PM)?)\s+(.*?\d{6}(?:,\s*India)?)\s+(.*?\d{6}(?:,\s*India)?)\s+This document is issued"
-                address_match = re.search(
-                    address_pattern, document_text, re.IGNORECASE | re.DOTALL
-                )
-
-                if address_match:
-                    date = address_match.group(1).replace("\n", " ").strip()
-                    source = address_match.group(2).replace("\n", " ").strip()
-                    destination = address_match.group(3).replace("\n", " ").strip()
-                    date = address_match.group(1).replace("\n", " ").strip()
-                    source = address_match.group(2).replace("\n", " ").strip()
-                    destination = address_match.group(3).replace("\n", " ").strip()
-
-                    # Clean "Selected Price..." from the source address
-                    cleanup_regex = r"Selected Price\s*[^\w\s]*\s*\d+(?:\.\d+)?\s*"
-                    source = re.sub(
-                        cleanup_regex, "", source, flags=re.IGNORECASE
-                    ).strip()
-
-        except Exception as execution_error:
-            amount = None
-            source = f"File reading error: {execution_error}"
-        return Receipt(
-            amount=amount,
-            path=str(path),
-            source=source,
-            destination=destination,
-            date=date,
-        )
+        return receipt_parsers.parseRapidoReceipt(path)
 
     def __repr__(self):
         return f"ReceiptManager(receipts={list(self.receipts.values())})"
 
 
-class ReceiptUploader:
-    def wait_for_keyword_cycle(self, keyword, timeout=30):
-        wait = WebDriverWait(driver, timeout)
-
-        # wait for keyword to show
-        wait.until(
-            EC.presence_of_element_located(
-                (By.XPATH, f"//*[contains(text(), '{keyword}')]")
-            )
-        )
-
-        # wait for keyword to disappear
-        wait.until(
-            EC.invisibility_of_element_located(
-                (By.XPATH, f"//*[contains(text(), '{keyword}')]")
-            )
-        )
+def __getattr__(name):
+    # ReceiptUploader pulls in selenium, so it is only imported when something asks for it.
+    if name == "ReceiptUploader":
+        from receipt_uploader import ReceiptUploader
 
-    def set_web_amount(self, amount: int):
-        wait = WebDriverWait(driver, 10)
-        wait.until(EC.visibility_of_element_located((By.ID, "claim-amount")))
-        driver.implicitly_wait(0.5)
-
-        amount_box = driver.find_element(by=By.ID, value="claim-amount")
-        amount_box.send_keys(str(amount))
-
-    def upload_file(self, file_path: str):
-        file_input = driver.find_element(By.ID, "import-img")
-        file_input.send_keys(file_path)
-        self.wait_for_keyword_cycle("rocessed")
-
-    def submit_claim(self):
-        wait = WebDriverWait(driver, 10)
-        if os.getenv("DEBUG", "False").upper() == "TRUE":
-            print("DEBUG mode is on, not submitting claim.")
-        else:
-            submit_btn = wait.until(EC.presence_of_element_located((By.ID, "submit-claim")))
-            driver.execute_script(
-                "arguments[0].scrollIntoView({block: 'center'});", submit_btn
-            )
-            wait.until(EC.element_to_be_clickable((By.ID, "submit-claim")))
-            submit_btn.click()
-        sleep(5)
-    
-    def upload_bill(self, receipt: Receipt):
-        if receipt.upload_type == UploadType.fuel:
-            self.upload_fuel_bill(receipt)
-        elif receipt.upload_type == UploadType.mobile:
-            self.upload_mobile_bill(receipt)
-        else:
-            print(f"Unknown upload type {receipt.upload_type} for receipt {receipt.path}")
-
-    def upload_fuel_bill(self, receipt: Receipt):
-        pluxee_url = os.getenv("PLUXEE_URL")
-        driver.get("https://google.com")
-        driver.get(pluxee_url)
-
-        self.set_web_amount(int(receipt.amount))
-        self.upload_file(receipt.path)
-        self.submit_claim()
-
-    def upload_mobile_bill(self, receipt: Receipt):
-        mobile_number = receipt.mobile_number
-        wait = WebDriverWait(driver, 10)
-        pluxee_url = os.getenv("PLUXEE_MOBILE_URL")
-
-        driver.get("https://google.com")
-        driver.get(pluxee_url)
-
-        self.set_web_amount(int(receipt.amount))
-        self.upload_file(receipt.path)
-
-        wait.until(
-            EC.presence_of_element_located(
-                (By.XPATH, f"//*[contains(text(), '{mobile_number}')]")
-            )
-        )
-        num_input = driver.find_element(
-            By.XPATH, f"//*[contains(text(), '{mobile_number}')]"
-        )
-        num_input.click()
-        self.submit_claim()
+        return ReceiptUploader
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+"""Page-by-page PDF text extraction.
+Text is yielded one page at a time so callers can stop as soon as the fields they need have
+appeared, and the cheap pypdfium2 text layer can be tried before pdfplumber's layout analysis.
+Whatever was read is kept in the text cache, so re-parsing an unchanged file never reopens it."""
+
+import os
+import re
+
+import metrics
+from text_cache import cached_text
+
+BACKENDS = ("pdfplumber", "pdfium")
+
+
+# Page iterators yield (text, last) so a reader that stops can tell whether pages were left unread.
+def iter_pdfplumber_pages(path, max_pages=None):
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        pages = pdf.pages[:max_pages]
+        for index, page in enumerate(pages):
+            yield page.extract_text() or "", index == len(pages) - 1
+
+
+def iter_pdfium_pages(path, max_pages=None):
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(path)
+    try:
+        page_count = min(len(pdf), max_pages or len(pdf))
+        for index in range(page_count):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            try:
+                yield textpage.get_text_range().replace("\r\n", "\n"), index == page_count - 1
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        pdf.close()
+
+
+PAGE_ITERATORS = {
+    "pdfplumber": iter_pdfplumber_pages,
+    "pdfium": iter_pdfium_pages,
+}
+
+
+def iter_page_text(path, backend="pdfplumber", max_pages=None):
+    return PAGE_ITERATORS[backend](path, max_pages)
+
+
+def is_complete(text, required_patterns):
+    return all(re.search(pattern, text) for pattern in required_patterns)
+
+
+def read_until_complete(path, required_patterns, backend, max_pages=None):
+    """Join page text until every required pattern has matched. Returns (text, complete, partial),
+    partial when pages were left unread because the patterns matched before the last one."""
+    document_text = ""
+    with metrics.span("pdf_text", backend=backend):
+        for extracted, last in iter_page_text(path, backend, max_pages):
+            if extracted:
+                document_text += extracted + "\n"
+            if required_patterns and is_complete(document_text, required_patterns):
+                return document_text, True, not last
+    return document_text, is_complete(document_text, required_patterns), False
+
+
+def extract_text(path, required_patterns=(), backend=None, max_pages=None):
+    """Extract text, stopping at the first page where all required_patterns have matched.
+
+    backend defaults to PDF_TEXT_BACKEND (pdfplumber). With "pdfium" the pypdfium2 text layer is
+    read first and pdfplumber is only used when that text does not contain every required field.
+    """
+    backend = backend or os.getenv("PDF_TEXT_BACKEND", "pdfplumber")
+    if max_pages is None and os.getenv("PDF_MAX_PAGES"):
+        max_pages = int(os.getenv("PDF_MAX_PAGES"))
+    return cached_text(
+        path,
+        f"pdf:{backend}:{max_pages or 'all'}",
+        lambda: read_text(path, required_patterns, backend, max_pages),
+        required_patterns,
+    )
+
+
+def read_text(path, required_patterns, backend, max_pages):
+    """Returns (text, partial); partial when reading stopped before the last page."""
+    if backend != "pdfplumber":
+        try:
+            document_text, complete, partial = read_until_complete(
+                path, required_patterns, backend, max_pages
+            )
+            if complete:
+                return document_text, partial
+        except Exception as backend_error:
+            print(f"{backend} could not read {path}, falling back to pdfplumber: {backend_error}")
+        metrics.increment("pdf_text_fallbacks", backend=backend)
+
+    document_text, _, partial = read_until_complete(path, required_patterns, "pdfplumber", max_pages)
+    return document_text, partial
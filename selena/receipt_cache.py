@@ -0,0 +1,88 @@
+"""On-disk cache of parsed receipts.
+Entries are keyed by the sha256 of the file content plus a parser version, so unchanged
+files skip pdfplumber/tesseract entirely and a parser change only invalidates its own entries."""
+
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+from CommonTypes import Receipt, UploadType
+
+CACHE_FILENAME = ".receipt_cache.sqlite"
+
+
+def cache_path_for(receipt_dir, cache_path=None):
+    """Where the cache for a receipt folder lives: an explicit path, RECEIPT_CACHE_PATH, or a file
+    inside the folder. Shared by ReceiptManager and the watcher so both use the same cache."""
+    return Path(cache_path or os.getenv("RECEIPT_CACHE_PATH") or Path(receipt_dir) / CACHE_FILENAME)
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parser_version(*parts):
+    """Derive a version string from whatever defines a parser (regex sources, config)."""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+class ReceiptCache:
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS parsed_receipts (
+                digest TEXT NOT NULL,
+                parser_version TEXT NOT NULL,
+                fields TEXT NOT NULL,
+                PRIMARY KEY (digest, parser_version)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, digest, version, path):
+        row = self.conn.execute(
+            "SELECT fields FROM parsed_receipts WHERE digest = ? AND parser_version = ?",
+            (digest, version),
+        ).fetchone()
+        if row is None:
+            return None
+        fields = json.loads(row[0])
+        upload_type = fields.pop("upload_type", None)
+        # The path is not part of the key: the same content may have been renamed or moved.
+        return Receipt(
+            path=str(path),
+            upload_type=UploadType(upload_type) if upload_type else None,
+            **fields,
+        )
+
+    def put(self, digest, version, receipt: Receipt):
+        fields = {
+            # Stored in rupees with the paise intact; Receipt rounds up only when asked for `amount`.
+            "amount": receipt.amount_paise / 100 if receipt.amount_paise is not None else None,
+            "source": receipt.source,
+            "destination": receipt.destination,
+            "date": receipt.date,
+            "mobile_number": receipt.mobile_number,
+            "upload_type": receipt.upload_type.value if receipt.upload_type else None,
+        }
+        self.conn.execute(
+            "INSERT OR REPLACE INTO parsed_receipts (digest, parser_version, fields) VALUES (?, ?, ?)",
+            (digest, version, json.dumps(fields)),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
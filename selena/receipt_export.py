@@ -0,0 +1,129 @@
+"""Bulk export of parsed receipts to a typed, indexed sqlite file.
+One row per receipt with integer paise and an ISO timestamp column, so month-end reconciliation
+loads and filters thousands of receipts with an index range scan instead of re-parsing files."""
+
+import sqlite3
+from datetime import datetime
+
+from CommonTypes import Receipt, UploadType
+
+EXPORT_COLUMNS = (
+    "path",
+    "digest",
+    "upload_type",
+    "amount_paise",
+    "date",
+    "date_iso",
+    "source",
+    "destination",
+    "mobile_number",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS receipts (
+    path TEXT PRIMARY KEY,
+    digest TEXT,
+    upload_type TEXT,
+    amount_paise INTEGER,
+    date TEXT,
+    date_iso TEXT,
+    source TEXT,
+    destination TEXT,
+    mobile_number TEXT
+);
+CREATE INDEX IF NOT EXISTS receipts_date_iso ON receipts (date_iso);
+CREATE INDEX IF NOT EXISTS receipts_type_date ON receipts (upload_type, date_iso);
+"""
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def export_row(receipt: Receipt, digest=None):
+    return (
+        receipt.path,
+        digest,
+        receipt.upload_type.value if receipt.upload_type else None,
+        receipt.amount_paise,
+        receipt.date,
+        receipt.when.isoformat(" ") if receipt.when else None,
+        receipt.source,
+        receipt.destination,
+        receipt.mobile_number,
+    )
+
+
+def export_receipts(db_path, receipts, digests=None):
+    """Write receipts (re-exporting a path replaces its row). digests maps path -> content hash."""
+    digests = digests or {}
+    rows = [export_row(receipt, digests.get(receipt.path)) for receipt in receipts]
+    conn = connect(db_path)
+    try:
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO receipts ({', '.join(EXPORT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(EXPORT_COLUMNS))})",
+                rows,
+            )
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def date_filter(upload_type=None, since=None, until=None):
+    """WHERE clause and parameters; since is inclusive and until exclusive."""
+    clauses = []
+    params = []
+    if upload_type is not None:
+        clauses.append("upload_type = ?")
+        params.append(UploadType(upload_type).value)
+    if since is not None:
+        clauses.append("date_iso >= ?")
+        params.append(datetime.fromisoformat(str(since)).isoformat(" "))
+    if until is not None:
+        clauses.append("date_iso < ?")
+        params.append(datetime.fromisoformat(str(until)).isoformat(" "))
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def load_receipts(db_path, upload_type=None, since=None, until=None):
+    where, params = date_filter(upload_type, since, until)
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT path, upload_type, amount_paise, date, source, destination, mobile_number "
+            f"FROM receipts{where} ORDER BY date_iso, path",
+            params,
+        ).fetchall()
+    finally:
+        conn.close()
+    return [
+        Receipt(
+            amount=amount_paise / 100 if amount_paise is not None else None,
+            path=path,
+            source=source,
+            destination=destination,
+            date=date,
+            mobile_number=mobile_number,
+            upload_type=upload_type,
+        )
+        for path, upload_type, amount_paise, date, source, destination, mobile_number in rows
+    ]
+
+
+def totals(db_path, since=None, until=None):
+    """{upload_type: (receipt count, total paise)} over the date range."""
+    where, params = date_filter(None, since, until)
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(
+            f"SELECT upload_type, COUNT(*), COALESCE(SUM(amount_paise), 0) FROM receipts{where} "
+            "GROUP BY upload_type",
+            params,
+        ).fetchall()
+    finally:
+        conn.close()
+    return {upload_type: (count, paise) for upload_type, count, paise in rows}
@@ -0,0 +1,174 @@
+"""Selenium-free receipt parsers.
+Kept apart from move_chrome so worker processes can import them without touching the browser."""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from pathlib import Path
+from time import perf_counter
+
+from CommonTypes import Receipt, ReceiptType, UploadType
+import extraction
+import metrics
+import ocr_parser
+from ocr_parser import OCR_BATCH_SIZE, mobikwikParser, parse_mobikwik_batch
+from pdf_text import extract_text
+from receipt_cache import parser_version
+from scanners import pool_for, pool_sizes, sniff
+
+READ_ERROR_PREFIX = "File reading error"
+
+# Derived from the patterns, so editing a regex only invalidates cache entries of that receipt type.
+PARSER_VERSIONS = {
+    ReceiptType.Rapido: parser_version(
+        *extraction.rule_patterns(ReceiptType.Rapido),
+        os.getenv("PDF_TEXT_BACKEND", "pdfplumber"),
+        UploadType.fuel.value,
+    ),
+    ReceiptType.Mobikwik: parser_version(
+        *extraction.rule_patterns(ReceiptType.Mobikwik),
+        ocr_parser.OCR_MAX_WIDTH,
+        ocr_parser.OCR_THRESHOLD,
+        ocr_parser.ocr_regions(),
+    ),
+}
+
+
+def receipt_type(path: Path):
+    """Sniffed from the file's contents; None means no parser handles it and it should be skipped."""
+    scanner = sniff(path)
+    return scanner.receipt_type if scanner is not None else None
+
+
+def parse_workers():
+    """Worker count for parallel parsing, from PARSE_WORKERS (0 or 1 means serial)."""
+    value = os.getenv("PARSE_WORKERS", "1")
+    if value.lower() == "auto":
+        return os.cpu_count() or 1
+    return max(int(value), 1)
+
+
+def parse_receipt(receipt_type, path: Path):
+    with metrics.span("parse", type=receipt_type.value):
+        return PARSERS[receipt_type](path)
+
+
+def parse_batch(receipt_type, paths):
+    """Parse several files of one type. Returns ({path: Receipt}, {path: error message})."""
+    if receipt_type == ReceiptType.Mobikwik:
+        # One tesseract process for the whole batch instead of one per screenshot.
+        with metrics.span("parse_batch", type=receipt_type.value):
+            return parse_mobikwik_batch(paths)
+    results = {}
+    errors = {}
+    for path in paths:
+        try:
+            results[path] = parse_receipt(receipt_type, path)
+        except Exception as parse_error:
+            errors[path] = f"{type(parse_error).__name__}: {parse_error}"
+    return results, errors
+
+
+def batch_jobs(jobs):
+    """Group (receipt_type, path) jobs into (receipt_type, [paths]) units of work: screenshots in
+    OCR_BATCH_SIZE chunks, everything else one file per unit."""
+    screenshots = [path for receipt_type, path in jobs if receipt_type == ReceiptType.Mobikwik]
+    units = [
+        (receipt_type, [path]) for receipt_type, path in jobs if receipt_type != ReceiptType.Mobikwik
+    ]
+    for begin in range(0, len(screenshots), OCR_BATCH_SIZE):
+        units.append((ReceiptType.Mobikwik, screenshots[begin : begin + OCR_BATCH_SIZE]))
+    return units
+
+
+def parse_paths(jobs, workers=1):
+    """Parse (receipt_type, path) jobs, serially or on one process pool per scanner pool.
+    Returns ({path: Receipt}, {path: error message}); results do not depend on completion order."""
+    results = {}
+    errors = {}
+    units = batch_jobs(jobs)
+
+    def collect(paths, outcome):
+        try:
+            parsed, failed = outcome()
+        except Exception as parse_error:
+            # A unit failing as a whole (e.g. tesseract itself crashed) fails each of its files.
+            parsed = {}
+            failed = {path: f"{type(parse_error).__name__}: {parse_error}" for path in paths}
+        results.update(parsed)
+        errors.update(failed)
+
+    if workers <= 1 or len(units) <= 1:
+        for receipt_type, paths in units:
+            collect(paths, lambda: parse_batch(receipt_type, paths))
+        return results, errors
+
+    # PDFs and screenshots get separately sized pools so slow OCR batches never starve PDF work.
+    sizes = pool_sizes(workers)
+    with ExitStack() as stack:
+        executors = {}
+        futures = {}
+        for receipt_type, paths in units:
+            pool = pool_for(receipt_type)
+            if pool not in executors:
+                executors[pool] = stack.enter_context(
+                    ProcessPoolExecutor(max_workers=max(1, sizes.get(pool, workers)))
+                )
+            futures[executors[pool].submit(parse_batch, receipt_type, paths)] = paths
+        for future in as_completed(futures):
+            collect(futures[future], future.result)
+    return results, errors
+
+
+def parseRapidoReceipt(path: Path):
+    # Logic to parse a Rapido receipt and extract information
+    try:
+        document_text = extract_text(path, extraction.required_patterns(ReceiptType.Rapido))
+
+        # forbidden_phrases = ["421203"]
+        # if any(phrase in document_text for phrase in forbidden_phrases):
+        #     print(f"Skipping {path.name} due to presence of forbidden phrases.")
+        #     return None
+
+        fields = extraction.extract_fields(ReceiptType.Rapido, document_text)
+    except Exception as execution_error:
+        fields = {"amount": None, "source": f"{READ_ERROR_PREFIX}: {execution_error}"}
+    return Receipt(path=str(path), upload_type=UploadType.fuel, **fields)
+
+
+# Add more receipt types and their corresponding parsing functions as needed.
+PARSERS = {
+    ReceiptType.Rapido: parseRapidoReceipt,
+    ReceiptType.Mobikwik: mobikwikParser,
+}
+
+
+def compare_parse_modes(receipt_dir, workers):
+    """Time the serial and parallel paths over the same directory, bypassing both caches."""
+    jobs = [(receipt_type(p), p) for p in sorted(Path(receipt_dir).glob("*.*"))]
+    jobs = [(kind, p) for kind, p in jobs if kind is not None]
+    timings = {}
+    # Both runs must really extract, so the text cache is off (pool workers inherit the env).
+    text_cache_setting = os.environ.get("TEXT_CACHE")
+    os.environ["TEXT_CACHE"] = "False"
+    try:
+        for mode, n in (("serial", 1), ("parallel", workers)):
+            start = perf_counter()
+            results, errors = parse_paths(jobs, n)
+            timings[mode] = perf_counter() - start
+            print(f"{mode} ({n} workers): {len(results)} parsed, {len(errors)} failed in {timings[mode]:.2f}s")
+    finally:
+        if text_cache_setting is None:
+            del os.environ["TEXT_CACHE"]
+        else:
+            os.environ["TEXT_CACHE"] = text_cache_setting
+    if timings["parallel"]:
+        print(f"speedup: {timings['serial'] / timings['parallel']:.2f}x")
+    return timings
+
+
+if __name__ == "__main__":
+    import sys
+
+    receipts_dir = sys.argv[1] if len(sys.argv) > 1 else os.getenv("RECEIPTS_SELENA", ".")
+    compare_parse_modes(receipts_dir, os.cpu_count() or 1)
@@ -0,0 +1,297 @@
+"""Drives the Pluxee portal to submit one claim per receipt.
+With PLUXEE_STATUS_SELECTOR set, the "Processing"/"Processed" cycle after a file is picked is
+watched by MutationObservers installed before the file goes in: one on the status element and a
+childList-only one on the page that re-attaches it if the portal re-renders that element. Each
+poll is then one cheap script call, and PLUXEE_PIPELINE_UPLOADS=TRUE can fill the amount while
+the portal is still processing the file. Without a selector the wait polls the page for the
+keyword as before."""
+
+import os
+from time import perf_counter
+
+from load_chrome import ChromeSession, default_session
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from CommonTypes import Receipt, UploadType
+import metrics
+
+# Records whether the keyword has appeared in, and then left, the status element since it was
+# installed.
+WATCH_STATUS_SCRIPT = """
+const [selector, keyword] = arguments;
+const state = {seen: false, done: false};
+let root = null;
+const check = () => {
+    if (root && root.textContent.includes(keyword)) {
+        state.seen = true;
+    } else if (state.seen) {
+        state.done = true;
+        statusObserver.disconnect();
+        pageObserver.disconnect();
+    }
+};
+const attach = () => {
+    root = document.querySelector(selector);
+    statusObserver.disconnect();
+    if (root) {
+        statusObserver.observe(root, {childList: true, subtree: true, characterData: true});
+    }
+};
+const statusObserver = new MutationObserver(check);
+// Only looks for a replaced status element, so text changes elsewhere cost nothing.
+const pageObserver = new MutationObserver(() => {
+    if (!state.done && (!root || !root.isConnected)) {
+        attach();
+        check();
+    }
+});
+if (window.receiptStatusWatch) {
+    window.receiptStatusWatch.statusObserver.disconnect();
+    window.receiptStatusWatch.pageObserver.disconnect();
+}
+window.receiptStatusWatch = {state, statusObserver, pageObserver};
+pageObserver.observe(document.body, {childList: true, subtree: true});
+attach();
+check();
+"""
+
+SUBMIT_GRACE_SECONDS = float(os.getenv("PLUXEE_SUBMIT_GRACE", "60"))
+
+
+class ClaimUnconfirmed(Exception):
+    """Submit was clicked but the portal never confirmed the claim. It may still have been filed,
+    so the receipt is reported as unconfirmed rather than failed and must not be retried blindly."""
+
+
+STATUS_DONE_SCRIPT = "return Boolean(window.receiptStatusWatch && window.receiptStatusWatch.state.done);"
+
+
+def pipelined_uploads():
+    return bool(os.getenv("PLUXEE_STATUS_SELECTOR")) and (
+        os.getenv("PLUXEE_PIPELINE_UPLOADS", "False").upper() == "TRUE"
+    )
+
+
+class ReceiptUploader:
+    def __init__(self, session: ChromeSession = None):
+        self.session = session or default_session
+        # URL of a portal form that is loaded and empty, ready for the next claim.
+        self.reusable_form = None
+        self.form_url = None
+        self.step_timings = []
+
+    @property
+    def driver(self):
+        # Chrome only starts on first use, so parsing-only runs never launch it.
+        return self.session.driver or self.session.get()
+
+    def watch_for_keyword_cycle(self, keyword):
+        """Start watching for keyword to show and then disappear. Call before the action that
+        triggers it, so a cycle that completes while other fields are being filled is not missed.
+        A no-op without PLUXEE_STATUS_SELECTOR, where the wait polls instead."""
+        selector = os.getenv("PLUXEE_STATUS_SELECTOR")
+        if selector:
+            self.driver.execute_script(WATCH_STATUS_SCRIPT, selector, keyword)
+
+    def wait_for_keyword_cycle(self, keyword, timeout=30, watching=False):
+        with metrics.span("wait_for_keyword_cycle"):
+            if not os.getenv("PLUXEE_STATUS_SELECTOR"):
+                self.wait_for_keyword(keyword, timeout)
+                return
+            if not watching:
+                self.watch_for_keyword_cycle(keyword)
+            WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(
+                lambda driver: driver.execute_script(STATUS_DONE_SCRIPT)
+            )
+
+    def wait_for_keyword(self, keyword, timeout):
+        wait = WebDriverWait(self.driver, timeout)
+
+        # wait for keyword to show
+        wait.until(
+            EC.presence_of_element_located(
+                (By.XPATH, f"//*[contains(text(), '{keyword}')]")
+            )
+        )
+
+        # wait for keyword to disappear
+        wait.until(
+            EC.invisibility_of_element_located(
+                (By.XPATH, f"//*[contains(text(), '{keyword}')]")
+            )
+        )
+
+    def open_form(self, pluxee_url):
+        # A form left empty by the previous submission is reused instead of reloading the portal.
+        if self.reusable_form == pluxee_url and self.form_is_reset():
+            self.form_url = pluxee_url
+            return
+        self.driver.get(pluxee_url)
+        self.reusable_form = None
+        self.form_url = pluxee_url
+
+    def form_is_reset(self):
+        try:
+            amount_box = self.driver.find_element(By.ID, "claim-amount")
+            return amount_box.is_displayed() and not amount_box.get_attribute("value")
+        except WebDriverException:
+            return False
+
+    def set_web_amount(self, amount: int):
+        wait = WebDriverWait(self.driver, 10)
+        amount_box = wait.until(EC.visibility_of_element_located((By.ID, "claim-amount")))
+        amount_box.clear()
+        amount_box.send_keys(str(amount))
+
+    def start_file_upload(self, file_path: str):
+        self.watch_for_keyword_cycle("rocessed")
+        file_input = self.driver.find_element(By.ID, "import-img")
+        file_input.send_keys(file_path)
+
+    def wait_for_file_processed(self):
+        self.wait_for_keyword_cycle("rocessed", watching=True)
+
+    def upload_file(self, file_path: str):
+        self.start_file_upload(file_path)
+        self.wait_for_file_processed()
+
+    def select_mobile_number(self, mobile_number):
+        wait = WebDriverWait(self.driver, 10)
+        # Search only the number list when PLUXEE_MOBILE_LIST_SELECTOR says where it is.
+        list_selector = os.getenv("PLUXEE_MOBILE_LIST_SELECTOR")
+        if list_selector:
+            number_list = wait.until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, list_selector))
+            )
+            num_input = wait.until(
+                lambda driver: number_list.find_element(
+                    By.XPATH, f".//*[contains(text(), '{mobile_number}')]"
+                )
+            )
+        else:
+            num_input = wait.until(
+                EC.presence_of_element_located(
+                    (By.XPATH, f"//*[contains(text(), '{mobile_number}')]")
+                )
+            )
+        num_input.click()
+
+    def submission_confirmed(self, driver):
+        """True once the portal shows the claim went through: it navigated away, cleared the form,
+        or shows PLUXEE_CONFIRMATION_TEXT."""
+        confirmation = os.getenv("PLUXEE_CONFIRMATION_TEXT")
+        if confirmation and driver.find_elements(
+            By.XPATH, f"//*[contains(text(), '{confirmation}')]"
+        ):
+            return True
+        amount_boxes = driver.find_elements(By.ID, "claim-amount")
+        return not amount_boxes or not amount_boxes[0].get_attribute("value")
+
+    def submit_claim(self, timeout=30):
+        wait = WebDriverWait(self.driver, 10)
+        if os.getenv("DEBUG", "False").upper() == "TRUE":
+            print("DEBUG mode is on, not submitting claim.")
+            self.reusable_form = None
+            return
+        submit_btn = wait.until(EC.presence_of_element_located((By.ID, "submit-claim")))
+        self.driver.execute_script(
+            "arguments[0].scrollIntoView({block: 'center'});", submit_btn
+        )
+        wait.until(EC.element_to_be_clickable((By.ID, "submit-claim")))
+        submit_btn.click()
+        try:
+            WebDriverWait(self.driver, timeout, ignored_exceptions=[WebDriverException]).until(
+                self.submission_confirmed
+            )
+        except TimeoutException:
+            self.reusable_form = None
+            if not self.claim_processed():
+                raise ClaimUnconfirmed(
+                    f"No confirmation within {timeout + SUBMIT_GRACE_SECONDS:.0f}s of submitting; "
+                    "check the portal before retrying this receipt."
+                )
+            print("# Claim confirmed after a slow portal response.")
+        self.reusable_form = self.form_url if self.form_is_reset() else None
+
+    def claim_processed(self):
+        """Second look after a submit timed out: slow portal responses often land a little later."""
+        try:
+            WebDriverWait(
+                self.driver, SUBMIT_GRACE_SECONDS, poll_frequency=1, ignored_exceptions=[WebDriverException]
+            ).until(self.submission_confirmed)
+            return True
+        except TimeoutException:
+            return False
+
+    def run_steps(self, receipt: Receipt, steps):
+        """Run (name, callable) steps in order, recording how long each one took."""
+        timings = {}
+        upload_type = receipt.upload_type.value if receipt.upload_type else None
+        for name, step in steps:
+            start = perf_counter()
+            with metrics.span("upload_step", step=name, upload_type=upload_type):
+                step()
+            timings[name] = perf_counter() - start
+        self.step_timings.append((receipt.path, timings))
+        print("# Timings: " + " ".join(f"{name}={seconds:.2f}s" for name, seconds in timings.items()))
+        return timings
+
+    def upload_bill(self, receipt: Receipt):
+        # Health-check once per receipt; a crashed browser is replaced before any step runs.
+        self.session.get()
+        if receipt.upload_type == UploadType.fuel:
+            self.upload_fuel_bill(receipt)
+        elif receipt.upload_type == UploadType.mobile:
+            self.upload_mobile_bill(receipt)
+        else:
+            print(f"Unknown upload type {receipt.upload_type} for receipt {receipt.path}")
+
+    def claim_steps(self, receipt: Receipt, pluxee_url):
+        """The steps of one claim: amount, then file. PLUXEE_PIPELINE_UPLOADS=TRUE puts the file in
+        first and types the amount while the portal processes it; that needs the status observer,
+        so it only applies with PLUXEE_STATUS_SELECTOR set, and is off until checked on the portal."""
+        set_amount = ("set_amount", lambda: self.set_web_amount(int(receipt.amount)))
+        steps = [("open_form", lambda: self.open_form(pluxee_url))]
+        if pipelined_uploads():
+            steps.append(("start_upload", lambda: self.start_file_upload(receipt.path)))
+            steps.append(set_amount)
+            steps.append(("await_processing", self.wait_for_file_processed))
+        else:
+            steps.append(set_amount)
+            steps.append(("upload_file", lambda: self.upload_file(receipt.path)))
+        if receipt.upload_type == UploadType.mobile:
+            # The number is picked once the file is processed, as the portal expects.
+            steps.append(("select_number", lambda: self.select_mobile_number(receipt.mobile_number)))
+        steps.append(("submit", self.submit_claim))
+        return steps
+
+    def upload_fuel_bill(self, receipt: Receipt):
+        return self.run_steps(receipt, self.claim_steps(receipt, os.getenv("PLUXEE_URL")))
+
+    def upload_mobile_bill(self, receipt: Receipt):
+        return self.run_steps(receipt, self.claim_steps(receipt, os.getenv("PLUXEE_MOBILE_URL")))
+
+    def upload_batch(self, receipts: list[Receipt]):
+        """Upload receipts grouped by UploadType, so each group works through one loaded form that
+        is reused claim after claim. Returns {path: None on success, else the exception}."""
+        groups = {}
+        for receipt in receipts:
+            groups.setdefault(receipt.upload_type, []).append(receipt)
+        results = {}
+        for upload_type, group in groups.items():
+            if upload_type not in (UploadType.fuel, UploadType.mobile):
+                for receipt in group:
+                    print(f"Unknown upload type {upload_type} for receipt {receipt.path}")
+                continue
+            for receipt in group:
+                try:
+                    self.upload_bill(receipt)
+                    results[receipt.path] = None
+                except Exception as upload_error:
+                    print(f"# Failed {receipt.path}: {type(upload_error).__name__}: {upload_error}")
+                    # Start the next claim from a fresh load rather than a half-filled form.
+                    self.reusable_form = None
+                    results[receipt.path] = upload_error
+        return results
@@ -0,0 +1,140 @@
+"""Pluggable receipt-type sniffing.
+Every scanner looks at the first bytes of a file, never its name, and claims it for a receipt type
+and a worker pool; a scanner can add a content check that only runs once the bytes match. A file
+no scanner claims is rejected before any parser or cache lookup runs. Rapido PDFs go to the "pdf"
+pool and phone screenshots to the heavier "ocr" pool, sized by pool_sizes()."""
+
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+
+from CommonTypes import ReceiptType
+
+SNIFF_BYTES = 2048
+PDF_MAGIC = b"%PDF-"
+# Readers accept junk before the header as long as it starts within the first KiB.
+PDF_MAGIC_WINDOW = 1024
+JPEG_MAGIC = b"\xff\xd8\xff"
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+# JPEG start-of-frame markers, which carry the image size; C4 (DHT) and C8 (JPG) are not frames.
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+@dataclass(frozen=True)
+class Scanner:
+    name: str
+    receipt_type: ReceiptType
+    pool: str
+    matches: object  # header bytes -> bool
+    confirms: object = None  # path -> bool, only called once matches() passed
+
+
+def is_pdf(header):
+    return PDF_MAGIC in header[: PDF_MAGIC_WINDOW + len(PDF_MAGIC)]
+
+
+def has_rapido_text(path):
+    # The first page's text layer (pypdfium2, falling back to pdfplumber) must show the fare or
+    # the Rapido footer, so other PDFs are rejected here instead of failing a full extraction.
+    # It goes through the text cache, so sniffing the same file again does not reopen it.
+    from extraction import AMOUNT_RE, FOOTER_RE
+    from pdf_text import extract_text
+
+    try:
+        text = extract_text(path, backend="pdfium", max_pages=1)
+    except Exception:
+        return False
+    return bool(AMOUNT_RE.search(text) or FOOTER_RE.search(text))
+
+
+def png_size(header):
+    # The IHDR chunk is always first: width and height follow its length and type.
+    if len(header) < 24 or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def jpeg_size(header):
+    """(width, height) from the first start-of-frame segment inside header, or None. Camera
+    photos carry large EXIF blocks that push the frame header past the sniffed bytes."""
+    offset = 2
+    while offset + 9 <= len(header):
+        if header[offset] != 0xFF:
+            return None
+        marker = header[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", header[offset + 5 : offset + 9])
+            return width, height
+        offset += 2 + struct.unpack(">H", header[offset + 2 : offset + 4])[0]
+    return None
+
+
+def image_size(header):
+    if header.startswith(PNG_MAGIC):
+        return png_size(header)
+    if header.startswith(JPEG_MAGIC):
+        return jpeg_size(header)
+    return None
+
+
+def is_screenshot(header):
+    # Mobikwik receipts are phone screenshots: a PNG or JPEG taller than it is wide. Anything
+    # else (landscape images, photos whose size is not in the header) is left unclaimed.
+    size = image_size(header)
+    return size is not None and 0 < size[0] < size[1]
+
+
+# Checked in order; the first match wins.
+SCANNERS = [
+    Scanner("rapido-pdf", ReceiptType.Rapido, "pdf", is_pdf, has_rapido_text),
+    Scanner("mobikwik-screenshot", ReceiptType.Mobikwik, "ocr", is_screenshot),
+]
+
+
+def register(name, receipt_type, pool, matches, confirms=None, first=False):
+    """Add a scanner, e.g. for a new receipt type; first=True lets it override the built-in ones."""
+    scanner = Scanner(name, receipt_type, pool, matches, confirms)
+    if first:
+        SCANNERS.insert(0, scanner)
+    else:
+        SCANNERS.append(scanner)
+    return scanner
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        return f.read(SNIFF_BYTES)
+
+
+def sniff(path: Path):
+    """The scanner that claims this file, or None for unreadable and unsupported files."""
+    try:
+        header = read_header(path)
+    except OSError:
+        return None
+    for scanner in SCANNERS:
+        if scanner.matches(header) and (scanner.confirms is None or scanner.confirms(path)):
+            return scanner
+    return None
+
+
+def pool_for(receipt_type):
+    for scanner in SCANNERS:
+        if scanner.receipt_type == receipt_type:
+            return scanner.pool
+    return "pdf"
+
+
+def pool_sizes(workers):
+    """Splits a total budget of workers between the pools, half to OCR and the rest to PDFs, each
+    at least 1. PDF_WORKERS/OCR_WORKERS override either share."""
+    ocr = max(1, workers // 2)
+    pdf = max(1, workers - ocr)
+    return {
+        "pdf": int(os.getenv("PDF_WORKERS", str(pdf))),
+        "ocr": int(os.getenv("OCR_WORKERS", str(ocr))),
+    }
@@ -1,6 +1,37 @@
-import dotenv
+"""Loads configuration into os.environ once per process.
+Values come from, in increasing priority: config.json in the repo root, the dotenv file
+(PLUXEE_ENV_FILE, default .envvars in the repo root) and the real environment."""
 
-dotenv.load_dotenv(
-    "/home/himanshu/workDesk/pluxee-scripts/.envvars",
-    verbose=True,
-)
+import json
+import os
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+CONFIG_PATH = REPO_DIR / "config.json"
+ENV_FILE = REPO_DIR / ".envvars"
+
+loaded = False
+
+
+def load(config_path=None, env_file=None):
+    global loaded
+    if loaded:
+        return
+    loaded = True
+
+    env_file = Path(env_file or os.getenv("PLUXEE_ENV_FILE") or ENV_FILE)
+    if env_file.exists():
+        import dotenv
+
+        dotenv.load_dotenv(env_file, verbose=True)
+
+    config_path = Path(config_path or os.getenv("PLUXEE_CONFIG") or CONFIG_PATH)
+    if config_path.exists():
+        with open(config_path) as f:
+            config = json.load(f)
+        for key, value in config.items():
+            os.environ.setdefault(key, str(value))
+
+    import metrics
+
+    metrics.configure()
@@ -0,0 +1,179 @@
+"""On-disk cache of extracted document text (PDF page text, tesseract output) keyed by file hash.
+It sits under ReceiptCache: editing a regex invalidates the parsed receipts, but their text is
+still here, so a re-parse only runs the regex stage. Text is stored zlib-compressed and the least
+recently used entries are evicted once the stored text outgrows TEXT_CACHE_MAX_MB.
+Configured with TEXT_CACHE (default TRUE), TEXT_CACHE_PATH and TEXT_CACHE_MAX_MB."""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import metrics
+from receipt_cache import file_digest
+
+DEFAULT_PATH = Path.home() / ".cache" / "pluxee-scripts" / "text_cache.sqlite"
+DEFAULT_MAX_MB = 64
+# Eviction frees down to this fraction of the cap so it does not run again on the next put.
+LOW_WATER = 0.9
+# last_used is only rewritten once it is this many seconds stale, so a warm re-parse stays read-only.
+TOUCH_RESOLUTION = 60
+
+
+class TextCache:
+    def __init__(self, db_path, max_bytes):
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        # Must be set before the first table exists; lets evict() hand pages back to the filesystem.
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS texts (
+                digest TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                text BLOB NOT NULL,
+                partial INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (digest, extractor)
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS texts_last_used ON texts (last_used)")
+        self.conn.commit()
+        # Summed once here and kept up to date by put() and evict(), so inserts never rescan the
+        # table. Other processes sharing the file are only seen again on the next open.
+        self.total = self.total_bytes()
+
+    def get(self, digest, extractor):
+        """(text, partial) or None. partial means extraction stopped early, once its required
+        patterns had matched, so the text may end before the document does."""
+        row = self.conn.execute(
+            "SELECT text, partial, last_used FROM texts WHERE digest = ? AND extractor = ?",
+            (digest, extractor),
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[2] > TOUCH_RESOLUTION:
+            self.conn.execute(
+                "UPDATE texts SET last_used = ? WHERE digest = ? AND extractor = ?",
+                (now, digest, extractor),
+            )
+            self.conn.commit()
+        return zlib.decompress(row[0]).decode(), bool(row[1])
+
+    def put(self, digest, extractor, text, partial=False):
+        blob = zlib.compress(text.encode())
+        replaced = self.conn.execute(
+            "SELECT size FROM texts WHERE digest = ? AND extractor = ?", (digest, extractor)
+        ).fetchone()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO texts (digest, extractor, text, partial, size, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (digest, extractor, blob, int(partial), len(blob), time.time()),
+        )
+        self.conn.commit()
+        self.total += len(blob) - (replaced[0] if replaced else 0)
+        self.evict()
+
+    def total_bytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM texts").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used entries until the stored text is back under the cap."""
+        excess = self.total - self.max_bytes
+        if excess <= 0:
+            return 0
+        excess += self.max_bytes * (1 - LOW_WATER)
+        victims = []
+        freed = 0
+        for digest, extractor, size in self.conn.execute(
+            "SELECT digest, extractor, size FROM texts ORDER BY last_used"
+        ):
+            victims.append((digest, extractor))
+            freed += size
+            if freed >= excess:
+                break
+        self.conn.executemany("DELETE FROM texts WHERE digest = ? AND extractor = ?", victims)
+        self.conn.commit()
+        self.total -= freed
+        self.conn.execute("PRAGMA incremental_vacuum")
+        metrics.increment("text_cache_evictions", len(victims))
+        return len(victims)
+
+    def close(self):
+        self.conn.close()
+
+
+def enabled():
+    return os.getenv("TEXT_CACHE", "True").upper() == "TRUE"
+
+
+# One connection per thread, reopened after a fork so pool workers never share a parent's handle.
+local = threading.local()
+
+
+def shared():
+    """This thread's TextCache, or None when TEXT_CACHE is off."""
+    if not enabled():
+        return None
+    path = Path(os.getenv("TEXT_CACHE_PATH") or DEFAULT_PATH)
+    key = (os.getpid(), path)
+    if getattr(local, "key", None) != key:
+        max_bytes = int(float(os.getenv("TEXT_CACHE_MAX_MB", str(DEFAULT_MAX_MB))) * 2**20)
+        local.cache = TextCache(path, max_bytes)
+        local.key = key
+    return local.cache
+
+
+def usable(text, partial, required_patterns):
+    # Early-exit text only serves callers whose required patterns it already satisfies.
+    if not partial:
+        return True
+    return bool(required_patterns) and all(re.search(pattern, text) for pattern in required_patterns)
+
+
+def lookup(path, extractor, required_patterns=()):
+    """(digest, cached text or None); digest is None when the cache is off or unusable."""
+    try:
+        cache = shared()
+        if cache is None:
+            return None, None
+        digest = file_digest(path)
+        hit = cache.get(digest, extractor)
+    except (OSError, sqlite3.Error) as cache_error:
+        print(f"# Text cache skipped for {path}: {cache_error}")
+        return None, None
+    if hit is not None and usable(*hit, required_patterns):
+        metrics.increment("text_cache", result="hit")
+        return digest, hit[0]
+    metrics.increment("text_cache", result="miss")
+    return digest, None
+
+
+def store(digest, extractor, text, partial=False):
+    cache = shared()
+    if digest is None or cache is None:
+        return
+    try:
+        cache.put(digest, extractor, text, partial)
+    except sqlite3.Error as cache_error:
+        print(f"# Could not cache text: {cache_error}")
+
+
+def cached_text(path, extractor, produce, required_patterns=()):
+    """Text of path from the cache, or from produce() -> (text, partial), which is then cached."""
+    digest, text = lookup(path, extractor, required_patterns)
+    if text is not None:
+        return text
+    text, partial = produce()
+    store(digest, extractor, text, partial)
+    return text
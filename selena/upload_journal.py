@@ -0,0 +1,68 @@
+"""Durable, append-only journal of upload progress keyed by receipt content hash.
+Every state change is a new fsync'd row, so after a crash a rerun knows which receipts were
+already submitted (skip), which were mid-upload (check by hand) and which still need uploading."""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+PARSED = "parsed"
+UPLOADING = "uploading"
+SUBMITTED = "submitted"
+DELETED = "deleted"
+
+FINISHED_STATES = (SUBMITTED, DELETED)
+
+DEFAULT_JOURNAL_PATH = Path.home() / ".cache" / "pluxee-scripts" / "upload_journal.sqlite"
+
+
+class UploadJournal:
+    def __init__(self, db_path=None):
+        db_path = Path(db_path or os.getenv("UPLOAD_JOURNAL_PATH") or DEFAULT_JOURNAL_PATH)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Upload workers report from their own threads; writes are serialised by the lock.
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS upload_events (
+                id INTEGER PRIMARY KEY,
+                digest TEXT NOT NULL,
+                path TEXT NOT NULL,
+                state TEXT NOT NULL,
+                recorded_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE INDEX IF NOT EXISTS upload_events_digest ON upload_events (digest, id);
+            """
+        )
+        self.states = dict(
+            self.conn.execute(
+                """
+                SELECT digest, state FROM upload_events
+                WHERE id IN (SELECT MAX(id) FROM upload_events GROUP BY digest)
+                """
+            ).fetchall()
+        )
+
+    def state(self, digest):
+        return self.states.get(digest)
+
+    def is_finished(self, digest):
+        return self.states.get(digest) in FINISHED_STATES
+
+    def record(self, digest, path, state):
+        with self.lock:
+            if self.states.get(digest) == state:
+                return
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO upload_events (digest, path, state) VALUES (?, ?, ?)",
+                    (digest, str(path), state),
+                )
+            self.states[digest] = state
+
+    def close(self):
+        self.conn.close()
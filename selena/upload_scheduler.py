@@ -0,0 +1,191 @@
+"""Concurrent upload scheduler.
+Each worker drives its own Chrome instance (one WebDriver cannot be used from several threads, and
+Chrome locks a profile directory to one process), pulls from its own fuel or mobile queue, and
+shares a portal-wide rate limit with the other workers."""
+
+import functools
+import os
+import queue
+import threading
+from time import monotonic, perf_counter, sleep
+
+from CommonTypes import Receipt, UploadType
+from load_chrome import ChromeSession, build_options, default_session
+import metrics
+from receipt_uploader import ClaimUnconfirmed, ReceiptUploader
+
+
+class RateLimiter:
+    """Spaces submissions across all workers to at most per_minute claims a minute (0 = no limit)."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_slot = monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        sleep(max(slot - now, 0))
+
+
+class UploadWorker(threading.Thread):
+    def __init__(
+        self, name, uploader: ReceiptUploader, receipt_queue, rate_limiter, on_start, on_result
+    ):
+        super().__init__(name=name, daemon=True)
+        self.uploader = uploader
+        self.receipt_queue = receipt_queue
+        self.rate_limiter = rate_limiter
+        self.on_start = on_start
+        self.on_result = on_result
+        self.uploaded = 0
+        self.failed = 0
+        self.unconfirmed = 0
+        self.busy_seconds = 0.0
+
+    def run(self):
+        while True:
+            receipt = self.receipt_queue.get()
+            if receipt is None:
+                return
+            with metrics.span("rate_limit_wait"):
+                self.rate_limiter.acquire()
+            start = perf_counter()
+            error = self.callback(self.on_start, receipt)
+            if error is None:
+                # A receipt whose start could not be journaled is not uploaded: a crash would lose it.
+                error = self.upload(receipt)
+            self.busy_seconds += perf_counter() - start
+            result_error = self.callback(self.on_result, receipt, error)
+            if error is None and result_error is not None:
+                # Submitted, but the outcome was not recorded: reported as failed so it gets checked.
+                self.uploaded -= 1
+                self.failed += 1
+                metrics.increment("uploads", worker=self.name, result="unrecorded")
+
+    def callback(self, function, *args):
+        """Run on_start/on_result, returning the exception instead of letting it end the thread."""
+        if function is None:
+            return None
+        try:
+            function(*args)
+        except Exception as callback_error:
+            print(f"# [{self.name}] {function.__name__} failed for {args[0].path}: {callback_error}")
+            metrics.event("upload_callback_failed", path=args[0].path, error=str(callback_error))
+            if function is self.on_start:
+                self.failed += 1
+                metrics.increment("uploads", worker=self.name, result="failed")
+            return callback_error
+        return None
+
+    def upload(self, receipt):
+        """Upload one receipt and return the exception it failed with, or None."""
+        try:
+            self.uploader.upload_bill(receipt)
+            self.uploaded += 1
+            metrics.increment("uploads", worker=self.name, result="submitted")
+            return None
+        except ClaimUnconfirmed as unconfirmed_error:
+            # Possibly filed: counted apart from failures, and left for a manual check.
+            self.unconfirmed += 1
+            metrics.increment("uploads", worker=self.name, result="unconfirmed")
+            self.uploader.reusable_form = None
+            print(f"# [{self.name}] Unconfirmed {receipt.path}: {unconfirmed_error}")
+            return unconfirmed_error
+        except Exception as upload_error:
+            self.failed += 1
+            metrics.increment("uploads", worker=self.name, result="failed")
+            metrics.event(
+                "upload_failed", path=receipt.path, error=f"{type(upload_error).__name__}: {upload_error}"
+            )
+            # Whatever state the form was left in, start the next claim from a fresh load.
+            self.uploader.reusable_form = None
+            print(f"# [{self.name}] Failed {receipt.path}: {type(upload_error).__name__}: {upload_error}")
+            return upload_error
+
+    def report(self):
+        per_minute = self.uploaded / self.busy_seconds * 60 if self.busy_seconds else 0.0
+        return {
+            "worker": self.name,
+            "uploaded": self.uploaded,
+            "failed": self.failed,
+            "unconfirmed": self.unconfirmed,
+            "busy_seconds": round(self.busy_seconds, 2),
+            "receipts_per_minute": round(per_minute, 2),
+        }
+
+
+def profile_sessions():
+    """One ChromeSession per profile directory in UPLOAD_PROFILE_PATHS (comma separated).
+    Without it there is a single session on CHROME_PROFILE_PATH."""
+    paths = [path.strip() for path in os.getenv("UPLOAD_PROFILE_PATHS", "").split(",") if path.strip()]
+    if not paths:
+        return [default_session]
+    return [ChromeSession(functools.partial(build_options, path)) for path in paths]
+
+
+class UploadScheduler:
+    def __init__(
+        self, sessions=None, mobile_workers=None, per_minute=None, on_start=None, on_result=None
+    ):
+        self.on_start = on_start
+        self.on_result = on_result
+        sessions = sessions or profile_sessions()
+        if mobile_workers is None:
+            mobile_workers = int(os.getenv("MOBILE_UPLOAD_WORKERS", "1" if len(sessions) > 1 else "0"))
+        if per_minute is None:
+            per_minute = float(os.getenv("PLUXEE_RATE_PER_MINUTE", "0"))
+        self.rate_limiter = RateLimiter(per_minute)
+        self.queues = {UploadType.fuel: queue.Queue(), UploadType.mobile: queue.Queue()}
+        self.workers = []
+
+        if len(sessions) == 1:
+            # A single browser cannot be split, so fuel and mobile receipts share one worker and queue.
+            self.queues[UploadType.mobile] = self.queues[UploadType.fuel]
+            self.add_worker("worker-0", sessions[0], UploadType.fuel)
+            return
+        mobile_workers = min(max(mobile_workers, 1), len(sessions) - 1)
+        for index, session in enumerate(sessions):
+            upload_type = UploadType.mobile if index < mobile_workers else UploadType.fuel
+            self.add_worker(f"{upload_type.value}-{index}", session, upload_type)
+
+    def add_worker(self, name, session, upload_type):
+        self.workers.append(
+            UploadWorker(
+                name,
+                ReceiptUploader(session),
+                self.queues[upload_type],
+                self.rate_limiter,
+                self.on_start,
+                self.on_result,
+            )
+        )
+
+    def run(self, receipts: list[Receipt]):
+        """Upload every receipt, blocking until all queues drain. Returns one report per worker."""
+        # Grouped by type, a worker shared by fuel and mobile receipts only switches forms once.
+        receipts = sorted(receipts, key=lambda receipt: str(receipt.upload_type))
+        for receipt in receipts:
+            if receipt.upload_type not in self.queues:
+                print(f"Unknown upload type {receipt.upload_type} for receipt {receipt.path}")
+                continue
+            self.queues[receipt.upload_type].put(receipt)
+        for worker in self.workers:
+            worker.receipt_queue.put(None)
+            worker.start()
+        for worker in self.workers:
+            worker.join()
+
+        reports = [worker.report() for worker in self.workers]
+        for report in reports:
+            print(
+                f"# {report['worker']}: {report['uploaded']} uploaded, {report['failed']} failed, "
+                f"{report['unconfirmed']} unconfirmed, "
+                f"{report['receipts_per_minute']} receipts/min"
+            )
+        return reports
@@ -0,0 +1,172 @@
+"""Background ingestion daemon.
+Watches the receipt folders (inotify on Linux, polling elsewhere) and parses new receipt files into
+the per-directory receipt cache as they land, so ReceiptManager starts with everything extracted."""
+
+import ctypes
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import sleep
+
+from receipt_cache import CACHE_FILENAME, ReceiptCache, cache_path_for, file_digest
+from receipt_parsers import PARSER_VERSIONS, READ_ERROR_PREFIX, parse_receipt, receipt_type
+from scanners import sniff
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_receipt_file(path: Path):
+    # Sniffed from the first bytes, so stray non-receipt files never reach the queue.
+    return not path.name.startswith(CACHE_FILENAME) and sniff(path) is not None
+
+
+class InotifyWatcher:
+    """Yields paths of files that were fully written or moved into the watched directories."""
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.libc = libc
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        for directory in directories:
+            wd = libc.inotify_add_watch(
+                self.fd, str(directory).encode(), IN_CLOSE_WRITE | IN_MOVED_TO
+            )
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            self.watches[wd] = Path(directory)
+
+    def __iter__(self):
+        while True:
+            readable, _, _ = select.select([self.fd], [], [], 1.0)
+            if not readable:
+                continue
+            buffer = os.read(self.fd, 64 * 1024)
+            offset = 0
+            while offset < len(buffer):
+                wd, _, _, name_len = EVENT_HEADER.unpack_from(buffer, offset)
+                offset += EVENT_HEADER.size
+                name = buffer[offset : offset + name_len].rstrip(b"\0").decode()
+                offset += name_len
+                if name and wd in self.watches:
+                    yield self.watches[wd] / name
+
+
+class PollingWatcher:
+    """Fallback for platforms without inotify: reports a file once its size and mtime hold still."""
+
+    def __init__(self, directories, interval=2.0):
+        self.directories = [Path(directory) for directory in directories]
+        self.interval = interval
+        self.signatures = {}
+        # Files present at startup count as reported; IngestionDaemon.enqueue_existing covers them.
+        self.reported = {}
+        for p, signature in self.scan():
+            self.signatures[p] = signature
+            self.reported[p] = signature
+
+    def scan(self):
+        for directory in self.directories:
+            for p in directory.glob("*.*"):
+                try:
+                    stat = p.stat()
+                except FileNotFoundError:
+                    continue
+                yield p, (stat.st_size, stat.st_mtime_ns)
+
+    def __iter__(self):
+        while True:
+            sleep(self.interval)
+            for p, signature in self.scan():
+                previous = self.signatures.get(p)
+                self.signatures[p] = signature
+                if previous == signature and self.reported.get(p) != signature:
+                    self.reported[p] = signature
+                    yield p
+
+
+def make_watcher(directories):
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directories)
+        except (OSError, AttributeError) as watch_error:
+            print(f"inotify unavailable ({watch_error}), falling back to polling.")
+    return PollingWatcher(directories, float(os.getenv("WATCH_POLL_INTERVAL", "2")))
+
+
+class IngestionDaemon:
+    """Feeds watched files through a bounded queue into a worker pool and stores the results."""
+
+    def __init__(self, directories, workers=None, queue_size=None):
+        self.directories = [Path(directory) for directory in directories]
+        self.workers = workers or int(os.getenv("WATCH_WORKERS", str(os.cpu_count() or 1)))
+        self.queue = queue.Queue(maxsize=queue_size or int(os.getenv("WATCH_QUEUE_SIZE", "64")))
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def enqueue_existing(self):
+        for directory in self.directories:
+            for p in sorted(directory.glob("*.*")):
+                if is_receipt_file(p):
+                    self.queue.put(p)
+
+    def ingest(self, cache, p: Path):
+        kind = receipt_type(p)
+        if kind is None:
+            return
+        digest = file_digest(p)
+        version = PARSER_VERSIONS[kind]
+        if cache.get(digest, version, p) is not None:
+            return
+        receipt = self.executor.submit(parse_receipt, kind, p).result()
+        if receipt is not None and not str(receipt.source).startswith(READ_ERROR_PREFIX):
+            cache.put(digest, version, receipt)
+        print(f"# Ingested {p}: {receipt}")
+
+    def worker(self):
+        # sqlite connections are per thread, so every worker keeps its own handle per directory.
+        caches = {}
+        while True:
+            p = self.queue.get()
+            try:
+                if p.parent not in caches:
+                    caches[p.parent] = ReceiptCache(cache_path_for(p.parent))
+                self.ingest(caches[p.parent], p)
+            except Exception as ingest_error:
+                print(f"# Failed to ingest {p}: {type(ingest_error).__name__}: {ingest_error}")
+            finally:
+                self.queue.task_done()
+
+    def run(self):
+        # Watch before listing, so files landing while the backlog drains are not missed; the
+        # backlog is queued from its own thread because the bounded queue blocks it.
+        watcher = make_watcher(self.directories)
+        for _ in range(self.workers):
+            threading.Thread(target=self.worker, daemon=True).start()
+        threading.Thread(target=self.enqueue_existing, daemon=True).start()
+        print(f"Watching {', '.join(map(str, self.directories))} with {self.workers} worker(s)")
+        for p in watcher:
+            if is_receipt_file(p):
+                self.queue.put(p)
+
+
+if __name__ == "__main__":
+    import setup
+
+    setup.load()
+    directories = sys.argv[1:] or [
+        directory
+        for directory in (os.getenv("RECEIPTS_SELENA"), os.getenv("RECEIPTS_DIRECTORY"))
+        if directory
+    ]
+    if not directories:
+        raise ValueError("Pass directories to watch or set RECEIPTS_SELENA / RECEIPTS_DIRECTORY")
+    IngestionDaemon(directories).run()
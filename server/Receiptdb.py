@@ -0,0 +1,212 @@
+"""SQLite receipt store behind the FastAPI server.
+One WAL-mode database, one reused connection per thread, bulk upserts keyed by path and
+keyset-paginated listing so pages stay cheap however many receipts accumulate."""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+import repo_paths  # noqa: F401
+from CommonTypes import date_timestamp, parse_receipt_date
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent / "receipts.sqlite"
+
+STATES = ("parsed", "uploading", "submitted", "deleted", "failed")
+
+COLUMNS = (
+    "path",
+    "hash",
+    "type",
+    "amount",
+    "date",
+    "date_ts",
+    "source",
+    "destination",
+    "mobile_number",
+    "state",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS receipts (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    hash TEXT,
+    type TEXT,
+    amount REAL,
+    date TEXT,
+    date_ts REAL,
+    source TEXT,
+    destination TEXT,
+    mobile_number TEXT,
+    state TEXT NOT NULL DEFAULT 'parsed',
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS receipts_state ON receipts (state, id);
+CREATE INDEX IF NOT EXISTS receipts_date ON receipts (date);
+CREATE INDEX IF NOT EXISTS receipts_hash ON receipts (hash);
+CREATE TABLE IF NOT EXISTS scan_jobs (
+    id TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    total INTEGER NOT NULL DEFAULT 0,
+    parsed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# Created after migrate() so databases made before date_ts existed get the column first.
+DATE_INDEX = "CREATE INDEX IF NOT EXISTS receipts_date_ts ON receipts (date_ts, id)"
+
+
+def receipt_date_ts(receipt):
+    if receipt.get("date_ts") is not None:
+        return receipt["date_ts"]
+    return date_timestamp(parse_receipt_date(receipt.get("date")))
+
+
+class ReceiptDB:
+    def __init__(self, db_path=None):
+        self.db_path = str(db_path or os.getenv("RECEIPT_DB_PATH") or DEFAULT_DB_PATH)
+        self.local = threading.local()
+        with self.connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self.migrate(conn)
+            conn.execute(DATE_INDEX)
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def migrate(self, conn):
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(receipts)")}
+        if "date_ts" in columns:
+            return
+        conn.execute("ALTER TABLE receipts ADD COLUMN date_ts REAL")
+        rows = conn.execute("SELECT id, date FROM receipts WHERE date IS NOT NULL").fetchall()
+        conn.executemany(
+            "UPDATE receipts SET date_ts = ? WHERE id = ?",
+            [(receipt_date_ts({"date": date}), receipt_id) for receipt_id, date in rows],
+        )
+
+    def upsert_many(self, receipts):
+        """Insert or update receipts (dicts keyed by COLUMNS) in one transaction. Returns the count.
+        Fields left out (None) keep their stored value, so {"path": ..., "state": ...} only moves
+        the state. date_ts is derived from date when the caller does not supply it. Raises
+        ValueError, before writing anything, if a receipt carries a state outside STATES."""
+        rows = [
+            {**{column: receipt.get(column) for column in COLUMNS}, "date_ts": receipt_date_ts(receipt)}
+            for receipt in receipts
+        ]
+        for row in rows:
+            if row["state"] is not None and row["state"] not in STATES:
+                raise ValueError(
+                    f"Unknown state {row['state']!r} for {row['path']}, expected one of {STATES}"
+                )
+        fields = COLUMNS[:-1]
+        updates = ", ".join(
+            f"{column} = COALESCE(excluded.{column}, receipts.{column})" for column in fields[1:]
+        )
+        with self.connection() as conn:
+            # A re-ingested receipt keeps its upload state unless the caller sets one explicitly.
+            conn.executemany(
+                f"""
+                INSERT INTO receipts ({", ".join(COLUMNS)})
+                VALUES ({", ".join(f":{column}" for column in fields)}, COALESCE(:state, 'parsed'))
+                ON CONFLICT(path) DO UPDATE SET {updates},
+                    state = COALESCE(:state, receipts.state),
+                    updated_at = CURRENT_TIMESTAMP
+                """,
+                rows,
+            )
+        return len(rows)
+
+    def get(self, receipt_id):
+        row = self.connection().execute(
+            "SELECT * FROM receipts WHERE id = ?", (receipt_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def set_state(self, receipt_id, state):
+        if state not in STATES:
+            raise ValueError(f"Unknown state {state!r}, expected one of {STATES}")
+        with self.connection() as conn:
+            cursor = conn.execute(
+                "UPDATE receipts SET state = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (state, receipt_id),
+            )
+        return cursor.rowcount > 0
+
+    def list(self, state=None, receipt_type=None, after_id=0, limit=50):
+        """One page of receipts in id order. Pass the last id seen as after_id for the next page."""
+        clauses = ["id > ?"]
+        params = [after_id]
+        if state is not None:
+            clauses.append("state = ?")
+            params.append(state)
+        if receipt_type is not None:
+            clauses.append("type = ?")
+            params.append(receipt_type)
+        params.append(limit)
+        rows = self.connection().execute(
+            f"SELECT * FROM receipts WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?",
+            params,
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_by_date(self, since=None, until=None, state=None, receipt_type=None, before=None, limit=50):
+        """One page of dated receipts in [since, until), newest first, read off the date_ts index.
+        Pass the (date_ts, id) of the last receipt seen as before for the next page."""
+        clauses = ["date_ts IS NOT NULL"]
+        params = []
+        if since is not None:
+            clauses.append("date_ts >= ?")
+            params.append(date_timestamp(since))
+        if until is not None:
+            clauses.append("date_ts < ?")
+            params.append(date_timestamp(until))
+        if state is not None:
+            clauses.append("state = ?")
+            params.append(state)
+        if receipt_type is not None:
+            clauses.append("type = ?")
+            params.append(receipt_type)
+        if before is not None:
+            clauses.append("(date_ts, id) < (?, ?)")
+            params.extend(before)
+        params.append(limit)
+        rows = self.connection().execute(
+            f"SELECT * FROM receipts WHERE {' AND '.join(clauses)} "
+            "ORDER BY date_ts DESC, id DESC LIMIT ?",
+            params,
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    # Scan jobs live in the database rather than in memory so every uvicorn worker sees them.
+    def create_job(self, job_id, directory):
+        with self.connection() as conn:
+            conn.execute("INSERT INTO scan_jobs (id, directory) VALUES (?, ?)", (job_id, directory))
+        return self.get_job(job_id)
+
+    def update_job(self, job_id, **fields):
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self.connection() as conn:
+            conn.execute(
+                f"UPDATE scan_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+
+    def get_job(self, job_id):
+        row = self.connection().execute(
+            "SELECT * FROM scan_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return dict(row) if row else None
@@ -1,6 +1,82 @@
-from fastapi import FastAPI
+import asyncio
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import date, datetime, time
+from time import perf_counter
 
-app = FastAPI()
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+import repo_paths  # noqa: F401
+from Receiptdb import ReceiptDB
+from scanning import list_receipt_files, scan_file
+import metrics
+from scanners import pool_sizes
+import setup
+
+# uvicorn imports this module in every worker process; config.json and .envvars are loaded before
+# anything reads the environment (RECEIPT_DB_PATH, SCAN_WORKERS, METRICS).
+setup.load()
+db = ReceiptDB()
+# pdfplumber and tesseract are CPU-bound, so they run in worker processes, not on the event loop:
+# one pool per scanner pool name ("pdf", "ocr"), so slow OCR never holds up PDFs.
+scan_pools = {}
+scan_tasks = set()
+UPSERT_BATCH = 50
+
+
+@asynccontextmanager
+async def lifespan(app):
+    sizes = pool_sizes(int(os.getenv("SCAN_WORKERS", os.cpu_count() or 1)))
+    for pool, size in sizes.items():
+        scan_pools[pool] = ProcessPoolExecutor(max_workers=max(1, size))
+    yield
+    for executor in scan_pools.values():
+        executor.shutdown(cancel_futures=True)
+    scan_pools.clear()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    if not metrics.ENABLED:
+        return await call_next(request)
+    start = perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.observe(
+        "http_request",
+        perf_counter() - start,
+        endpoint=route.path if route is not None else "unknown",
+        status=response.status_code,
+    )
+    return response
+
+
+class ReceiptIn(BaseModel):
+    path: str
+    hash: str | None = None
+    type: str | None = None
+    amount: float | None = None
+    date: str | None = None
+    date_ts: float | None = None
+    source: str | None = None
+    destination: str | None = None
+    mobile_number: str | None = None
+    state: str | None = None
+
+
+class StateIn(BaseModel):
+    state: str
+
+
+class ScanIn(BaseModel):
+    directory: str
 
 
 @app.get("/")
@@ -8,6 +84,128 @@ def read_root():
     return {"Hello": "World"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    # Each uvicorn worker is its own process, so a scrape sees the worker that answered it.
+    return metrics.render_prometheus()
+
+
 @app.get("/receipt/{receipt_id}")
 def read_item(receipt_id: int, q: str | None = None):
-    return {"receipt_id": receipt_id, "amount": 0, "state": 0}
+    receipt = db.get(receipt_id)
+    if receipt is None:
+        raise HTTPException(status_code=404, detail=f"Receipt {receipt_id} not found")
+    return receipt
+
+
+@app.put("/receipt/{receipt_id}/state")
+def update_state(receipt_id: int, body: StateIn):
+    try:
+        updated = db.set_state(receipt_id, body.state)
+    except ValueError as state_error:
+        raise HTTPException(status_code=422, detail=str(state_error))
+    if not updated:
+        raise HTTPException(status_code=404, detail=f"Receipt {receipt_id} not found")
+    return db.get(receipt_id)
+
+
+@app.get("/receipts")
+def list_receipts(
+    state: str | None = None,
+    type: str | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    since: date | None = None,
+    until: date | None = None,
+):
+    """Pages in id order, or newest first when since/until is given (cursor is then "date_ts:id")."""
+    if since is None and until is None:
+        try:
+            after_id = int(cursor or 0)
+        except ValueError as cursor_error:
+            raise HTTPException(status_code=422, detail=f"Invalid cursor: {cursor_error}")
+        receipts = db.list(state=state, receipt_type=type, after_id=after_id, limit=limit)
+        next_cursor = receipts[-1]["id"] if len(receipts) == limit else None
+        return {"receipts": receipts, "next_cursor": next_cursor}
+
+    before = None
+    if cursor:
+        try:
+            date_ts, receipt_id = cursor.split(":")
+            before = (float(date_ts), int(receipt_id))
+        except ValueError as cursor_error:
+            raise HTTPException(
+                status_code=422, detail=f"Invalid cursor, expected date_ts:id: {cursor_error}"
+            )
+    since, until = (day and datetime.combine(day, time()) for day in (since, until))
+    receipts = db.list_by_date(
+        since=since, until=until, state=state, receipt_type=type, before=before, limit=limit
+    )
+    next_cursor = None
+    if len(receipts) == limit:
+        next_cursor = f"{receipts[-1]['date_ts']}:{receipts[-1]['id']}"
+    return {"receipts": receipts, "next_cursor": next_cursor}
+
+
+@app.post("/receipts/bulk")
+def bulk_upsert(receipts: list[ReceiptIn]):
+    try:
+        count = db.upsert_many(receipt.model_dump() for receipt in receipts)
+    except ValueError as state_error:
+        raise HTTPException(status_code=422, detail=str(state_error))
+    return {"upserted": count}
+
+
+async def run_scan(job_id, directory):
+    loop = asyncio.get_running_loop()
+    start = perf_counter()
+    try:
+        files = await asyncio.to_thread(list_receipt_files, directory)
+        await asyncio.to_thread(db.update_job, job_id, state="running", total=len(files))
+        futures = [
+            loop.run_in_executor(scan_pools[pool], scan_file, path, kind)
+            for path, kind, pool in files
+        ]
+        batch = []
+        parsed = failed = 0
+        for future in asyncio.as_completed(futures):
+            try:
+                batch.append(await future)
+                parsed += 1
+                metrics.increment("scan_files", result="parsed")
+            except Exception as scan_error:
+                failed += 1
+                metrics.increment("scan_files", result="failed")
+                print(f"# Scan {job_id} failed on a file: {scan_error}")
+            if len(batch) >= UPSERT_BATCH:
+                await asyncio.to_thread(db.upsert_many, batch)
+                batch = []
+                await asyncio.to_thread(db.update_job, job_id, parsed=parsed, failed=failed)
+        if batch:
+            await asyncio.to_thread(db.upsert_many, batch)
+        await asyncio.to_thread(
+            db.update_job, job_id, state="done", parsed=parsed, failed=failed
+        )
+        metrics.observe("scan_job", perf_counter() - start)
+    except Exception as scan_error:
+        await asyncio.to_thread(db.update_job, job_id, state="failed", error=str(scan_error))
+
+
+@app.post("/receipts/scan", status_code=202)
+async def scan_directory(body: ScanIn):
+    if not os.path.isdir(body.directory):
+        raise HTTPException(status_code=404, detail=f"Directory {body.directory} not found")
+    job_id = uuid.uuid4().hex
+    job = await asyncio.to_thread(db.create_job, job_id, body.directory)
+    task = asyncio.create_task(run_scan(job_id, body.directory))
+    scan_tasks.add(task)
+    task.add_done_callback(scan_tasks.discard)
+    return job
+
+
+@app.get("/jobs/{job_id}")
+def read_job(job_id: str):
+    job = db.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
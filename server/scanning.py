@@ -0,0 +1,40 @@
+"""Parsing work run inside the server's process pool, away from the event loop."""
+
+from pathlib import Path
+
+import repo_paths  # noqa: F401  (the parsers live with the selena scripts)
+from receipt_cache import CACHE_FILENAME, file_digest
+from CommonTypes import ReceiptType
+from receipt_parsers import parse_receipt
+from scanners import sniff
+
+
+def list_receipt_files(directory):
+    """(path, receipt type value, pool name) for every file a scanner recognises, sorted by path.
+    Everything else is dropped here, before it costs a worker process any time."""
+    files = []
+    for p in sorted(Path(directory).glob("*.*")):
+        if p.name.startswith(CACHE_FILENAME):
+            continue
+        scanner = sniff(p)
+        if scanner is not None:
+            files.append((str(p), scanner.receipt_type.value, scanner.pool))
+    return files
+
+
+def scan_file(path, kind):
+    """Parse one file of a sniffed receipt type into a row for Receiptdb.upsert_many."""
+    p = Path(path)
+    kind = ReceiptType(kind)
+    receipt = parse_receipt(kind, p)
+    return {
+        "path": str(p.resolve()),
+        "hash": file_digest(p),
+        "type": kind.value,
+        "amount": receipt.amount,
+        "date": receipt.date,
+        "date_ts": receipt.timestamp,
+        "source": receipt.source,
+        "destination": receipt.destination,
+        "mobile_number": receipt.mobile_number,
+    }
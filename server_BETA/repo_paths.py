@@ -0,0 +1,11 @@
+"""Makes the shared selena modules importable from server_BETA/. Its entry points run from this
+directory, so importing this module first is all they need; no package install is involved."""
+
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SELENA_DIR = os.path.join(REPO_DIR, "selena")
+
+if SELENA_DIR not in sys.path:
+    sys.path.insert(0, SELENA_DIR)
@@ -1,101 +1,303 @@
+import base64
+import bisect
+import json
 import os
-import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from time import perf_counter
 
-import pdfplumber
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 
+# Share the page-streaming extractor and the field-extraction engine with the selena scripts.
+import repo_paths  # noqa: F401
+from CommonTypes import ReceiptType, date_timestamp, parse_receipt_date
+from extraction import extract_fields, required_patterns
+import metrics
+from ocr_parser import ocr_batch
+from pdf_text import extract_text
+from scanners import pool_sizes, sniff
+import setup
+
+# Loaded on import so `flask run` picks up config.json and .envvars (METRICS, EXTRACT_WORKERS, ...)
+# as well as `python server.py`.
+setup.load()
 app = Flask(__name__)
 
 
-def process_receipts(directory_path):
+def not_found_if_none(value):
+    return "Not Found" if value is None else value
+
+
+def ocr_text(exact_file_path):
+    texts, errors = ocr_batch([exact_file_path])
+    if exact_file_path in errors:
+        raise ValueError(errors[exact_file_path])
+    return texts[exact_file_path][0]
+
+
+# How each sniffed receipt type is turned into text for extract_fields.
+TEXT_EXTRACTORS = {
+    ReceiptType.Rapido: lambda path: extract_text(path, required_patterns(ReceiptType.Rapido)),
+    ReceiptType.Mobikwik: ocr_text,
+}
+
+
+def parse_receipt_file(exact_file_path, receipt_type=ReceiptType.Rapido):
+    """Extracts one receipt file into the record returned by /extract."""
+    try:
+        with metrics.span("parse", type=receipt_type.value):
+            document_text = TEXT_EXTRACTORS[receipt_type](exact_file_path)
+            fields = extract_fields(receipt_type, document_text)
+    except Exception as execution_error:
+        metrics.increment("parse_failures", type=receipt_type.value)
+        fields = {
+            "amount": "Error",
+            "source": f"File reading error: {execution_error}",
+        }
+
+    return {
+        "exact_file_path": exact_file_path,
+        "type": receipt_type.value,
+        "date": not_found_if_none(fields.get("date")),
+        # Parsed once here; sorting and date filters only ever compare this number.
+        "timestamp": date_timestamp(parse_receipt_date(fields.get("date"))),
+        "amount": not_found_if_none(fields.get("amount")),
+        "source": not_found_if_none(fields.get("source")),
+        "destination": not_found_if_none(fields.get("destination")),
+        "mobile_number": not_found_if_none(fields.get("mobile_number")),
+    }
+
+
+# Lazily created process pools keyed by scanner pool name ("pdf", "ocr"), only used when
+# EXTRACT_WORKERS is above 1; pool_sizes() splits those workers between them.
+extract_pools = {}
+extract_pools_lock = threading.Lock()
+
+
+def extract_workers():
+    return int(os.getenv("EXTRACT_WORKERS", "1"))
+
+
+def extract_pool(pool):
+    with extract_pools_lock:
+        executor = extract_pools.get(pool)
+        if executor is None:
+            size = pool_sizes(extract_workers()).get(pool, 1)
+            executor = extract_pools[pool] = ProcessPoolExecutor(max_workers=max(1, size))
+    return executor
+
+
+def parse_receipt_files(files):
+    """Yields (path, signature, record) for (path, signature, scanner) jobs as each one finishes."""
+    if extract_workers() <= 1 or len(files) <= 1:
+        for exact_file_path, signature, scanner in files:
+            yield exact_file_path, signature, parse_receipt_file(exact_file_path, scanner.receipt_type)
+        return
+    futures = {
+        extract_pool(scanner.pool).submit(
+            parse_receipt_file, exact_file_path, scanner.receipt_type
+        ): (exact_file_path, signature)
+        for exact_file_path, signature, scanner in files
+    }
+    for future in as_completed(futures):
+        exact_file_path, signature = futures[future]
+        yield exact_file_path, signature, future.result()
+
+
+class DirectoryIndex:
     """
-    Scans the directory, extracts data from PDFs, and compiles a dictionary list.
+    Remembers (size, mtime, parsed record) for every receipt file in one directory so a refresh
+    only parses new or changed files, drops deleted ones, and reuses the sorted list when nothing
+    moved. Files no scanner recognises are remembered by signature and never sniffed twice.
     """
-    receipt_data = []
 
+    def __init__(self, directory_path):
+        self.directory_path = directory_path
+        self.entries = {}
+        self.rejected = {}
+        self.sorted_records = []
+        self.sorted_keys = []
+        # Set whenever entries change, and kept set if a streaming client disconnects mid-scan.
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def iter_refresh(self):
+        """
+        Yields every record in the directory as soon as it is available: unchanged files come
+        straight from the index, new or changed ones right after they are parsed. The lock covers
+        scanning, parsing and updating the index but is never held across a yield, so a client
+        holding a stream open (uploader.py waits on input() per receipt) blocks nobody else.
+        """
+        with self.lock:
+            unchanged, changed = self.scan()
+        yield from unchanged
+
+        parsed = parse_receipt_files(changed)
+        while True:
+            with self.lock:
+                item = next(parsed, None)
+                if item is None:
+                    self.sort()
+                    return
+                exact_file_path, signature, record = item
+                self.entries[exact_file_path] = (signature, record, sort_key(record))
+                self.dirty = True
+            yield record
+
+    def scan(self):
+        """Returns (records of unchanged files, (path, signature, scanner) of files to parse) and
+        forgets deleted files. Called with the lock held."""
+        seen = set()
+        unchanged = []
+        changed = []
+        with os.scandir(self.directory_path) as scan:
+            for entry in scan:
+                if not entry.is_file():
+                    continue
+                exact_file_path = os.path.abspath(entry.path)
+                stat = entry.stat()
+                signature = (stat.st_size, stat.st_mtime_ns)
+                seen.add(exact_file_path)
+
+                cached = self.entries.get(exact_file_path)
+                if cached is not None and cached[0] == signature:
+                    unchanged.append(cached[1])
+                    continue
+                if self.rejected.get(exact_file_path) == signature:
+                    continue
+                scanner = sniff(exact_file_path)
+                if scanner is None:
+                    self.rejected[exact_file_path] = signature
+                    if self.entries.pop(exact_file_path, None) is not None:
+                        self.dirty = True
+                    metrics.increment("receipts_skipped", reason="unsupported")
+                    continue
+                self.rejected.pop(exact_file_path, None)
+                changed.append((exact_file_path, signature, scanner))
+
+        for exact_file_path in set(self.entries) - seen:
+            del self.entries[exact_file_path]
+            self.dirty = True
+        for exact_file_path in set(self.rejected) - seen:
+            del self.rejected[exact_file_path]
+        return unchanged, changed
+
+    def sort(self):
+        if self.dirty:
+            # Newest first, ordered on the keys computed when each file was parsed.
+            ordered = sorted((key, record) for _, record, key in self.entries.values())
+            self.sorted_keys = [key for key, _ in ordered]
+            self.sorted_records = [record for _, record in ordered]
+            self.dirty = False
+
+    def refresh(self):
+        return list(self.snapshot()[1])
+
+    def snapshot(self):
+        """Refreshes, then returns the sorted keys and records as one consistent pair."""
+        for _ in self.iter_refresh():
+            pass
+        with self.lock:
+            return self.sorted_keys, self.sorted_records
+
+    def page(self, cursor=None, limit=50):
+        """One page of the date-sorted list starting after cursor, plus the cursor of the next page."""
+        sorted_keys, sorted_records = self.snapshot()
+        start = bisect.bisect_right(sorted_keys, decode_cursor(cursor)) if cursor else 0
+        records = sorted_records[start : start + limit]
+        next_cursor = None
+        if start + limit < len(sorted_records):
+            next_cursor = encode_cursor(sorted_keys[start + limit - 1])
+        return records, next_cursor
+
+    def between(self, since=None, until=None):
+        """Records dated in [since, until), newest first, found by bisecting the sorted keys."""
+        sorted_keys, sorted_records = self.snapshot()
+        start = 0
+        # Undated receipts sort last under an infinite key and never fall inside a range.
+        end = bisect.bisect_left(sorted_keys, (float("inf"), ""))
+        if until is not None:
+            start = bisect.bisect_right(sorted_keys, (-date_timestamp(until), "\uffff"))
+        if since is not None:
+            end = min(end, bisect.bisect_right(sorted_keys, (-date_timestamp(since), "\uffff")))
+        return sorted_records[start:end]
+
+
+def sort_key(record):
+    # Ascending order of this key is newest first; the path breaks ties so cursors stay unambiguous.
+    # Undated receipts sort last.
+    timestamp = record["timestamp"]
+    return (-timestamp if timestamp is not None else float("inf")), record["exact_file_path"]
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """The sort key encoded in cursor. Raises ValueError for anything encode_cursor did not make."""
+    key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not (isinstance(key, list) and len(key) == 2 and isinstance(key[1], str)):
+        raise ValueError(f"cursor {cursor!r} is not a [timestamp, path] pair")
+    seconds, path = key
+    if not isinstance(seconds, (int, float)) or isinstance(seconds, bool):
+        raise ValueError(f"cursor {cursor!r} has a non-numeric timestamp")
+    return float(seconds), path
+
+
+directory_indexes = {}
+directory_indexes_lock = threading.Lock()
+
+
+def directory_index(directory_path):
+    key = os.path.abspath(directory_path)
+    with directory_indexes_lock:
+        index = directory_indexes.get(key)
+        if index is None:
+            index = directory_indexes[key] = DirectoryIndex(key)
+    return index
+
+
+def process_receipts(directory_path):
+    """
+    Scans the directory, extracts data from new or changed receipt files, and compiles a dictionary list.
+    """
     if not os.path.exists(directory_path):
         return {"error": f"The directory '{directory_path}' could not be located."}, 404
 
-    for filename in os.listdir(directory_path):
-        if filename.lower().endswith(".pdf"):
-            exact_file_path = os.path.abspath(os.path.join(directory_path, filename))
-
-            amount = "Not Found"
-            date = "Not Found"
-            date = "Not Found"
-            source = "Not Found"
-            destination = "Not Found"
-
-            try:
-                with pdfplumber.open(exact_file_path) as pdf:
-                    document_text = ""
-                    for page in pdf.pages:
-                        extracted = page.extract_text()
-                        if extracted:
-                            document_text += extracted + "\n"
-
-                    # Extract Amount
-                    amount_match = re.search(
-                        r"Selected Price\D*(\d+(?:\.\d+)?)",
-                        document_text,
-                        re.IGNORECASE,
-                    )
-                    if amount_match:
-                        amount = amount_match.group(1)
-
-                    # Extract Date, Source, and Destination
-                    address_pattern = r"([A-Z]{3,9}\s+\d{1,2}(?:st|nd|rd|th)?\s+\d{4},\s*\d{1,2}:\d{2}\s*(?:AM|PM)?)\s+(.*?\d{6}(?:,\s*India)?)\s+(.*?\d{6}(?:,\s*India)?)\s+This document is issued"
-                    # Extract Date, Source, and Destination
-                    address_pattern = r"([A-Z]{3,9}\s+\d{1,2}(?:st|nd|rd|th)?\s+\d{4},\s*\d{1,2}:\d{2}\s*(?:AM|PM)?)\s+(.*?\d{6}(?:,\s*India)?)\s+(.*?\d{6}(?:,\s*India)?)\s+This document is issued"
-                    address_match = re.search(
-                        address_pattern, document_text, re.IGNORECASE | re.DOTALL
-                    )
-
-                    if address_match:
-                        date = address_match.group(1).replace("\n", " ").strip()
-                        source = address_match.group(2).replace("\n", " ").strip()
-                        destination = address_match.group(3).replace("\n", " ").strip()
-                        date = address_match.group(1).replace("\n", " ").strip()
-                        source = address_match.group(2).replace("\n", " ").strip()
-                        destination = address_match.group(3).replace("\n", " ").strip()
-
-                        # Clean "Selected Price..." from the source address
-                        cleanup_regex = r"Selected Price\s*[^\w\s]*\s*\d+(?:\.\d+)?\s*"
-                        source = re.sub(
-                            cleanup_regex, "", source, flags=re.IGNORECASE
-                        ).strip()
-
-            except Exception as execution_error:
-                amount = "Error"
-                source = f"File reading error: {execution_error}"
-
-            # Append the extracted data to our payload list
-            receipt_data.append(
-                {
-                    "exact_file_path": exact_file_path,
-                    "date": date,
-                    "amount": amount,
-                    "source": source,
-                    "destination": destination,
-                }
-            )
+    return {"receipts": directory_index(directory_path).refresh()}, 200
 
-    # --- NEW: Sorting Logic ---
-    def parse_date_for_sort(date_str):
-        if date_str in ("Not Found", "Error", ""):
-            return datetime.min  # Pushes unreadable dates to the bottom
-        try:
-            # Removes st, nd, rd, th so the datetime module can read it
-            clean_date = re.sub(r"(?<=\d)(st|nd|rd|th)", "", date_str)
-            return datetime.strptime(clean_date, "%b %d %Y, %I:%M %p")
-        except ValueError:
-            return datetime.min
 
-    # Sorts the dictionary list descending based on the parsed datetime
-    receipt_data.sort(key=lambda x: parse_date_for_sort(x["date"]), reverse=True)
+def stream_receipts(directory_path):
+    """Yields one NDJSON line per receipt, in parse order rather than date order."""
+    for record in directory_index(directory_path).iter_refresh():
+        yield json.dumps(record) + "\n"
+
+
+@app.before_request
+def start_request_timer():
+    if metrics.ENABLED:
+        g.request_start = perf_counter()
+
 
-    return {"receipts": receipt_data}, 200
+@app.after_request
+def record_request(response):
+    if metrics.ENABLED and "request_start" in g:
+        # Streamed responses are timed to their first byte, not to the end of the stream.
+        metrics.observe(
+            "http_request",
+            perf_counter() - g.request_start,
+            endpoint=request.endpoint or "unknown",
+            status=response.status_code,
+        )
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_api():
+    """Prometheus scrape endpoint; empty unless the server runs with METRICS=TRUE."""
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/extract", methods=["GET"])
@@ -103,10 +305,44 @@ def extract_api():
     """
     API Endpoint to trigger the extraction.
     Expects a query parameter: ?directory=path_to_folder
+    Optional: &stream=1 for NDJSON emitted as each receipt is parsed, or
+    &limit=N[&cursor=...] for one date-sorted page and the cursor of the next, or
+    &since=YYYY-MM-DD[&until=YYYY-MM-DD] for the receipts dated in that range, newest first.
     """
     target_directory = request.args.get("directory", ".")
-    payload, status_code = process_receipts(target_directory)
+    if not os.path.exists(target_directory):
+        payload, status_code = process_receipts(target_directory)
+        return jsonify(payload), status_code
+
+    if request.args.get("stream", "").lower() in ("1", "true"):
+        return Response(
+            stream_with_context(stream_receipts(target_directory)),
+            mimetype="application/x-ndjson",
+        )
 
+    if "since" in request.args or "until" in request.args:
+        try:
+            since, until = (
+                datetime.fromisoformat(request.args[name]) if name in request.args else None
+                for name in ("since", "until")
+            )
+        except ValueError as date_error:
+            return jsonify({"error": f"Invalid date range: {date_error}"}), 400
+        return jsonify({"receipts": directory_index(target_directory).between(since, until)}), 200
+
+    if "limit" in request.args or "cursor" in request.args:
+        try:
+            limit = int(request.args.get("limit", 50))
+            if limit < 1:
+                raise ValueError(f"limit must be at least 1, got {limit}")
+            records, next_cursor = directory_index(target_directory).page(
+                request.args.get("cursor"), limit
+            )
+        except ValueError as page_error:
+            return jsonify({"error": f"Invalid pagination parameters: {page_error}"}), 400
+        return jsonify({"receipts": records, "next_cursor": next_cursor}), 200
+
+    payload, status_code = process_receipts(target_directory)
     return jsonify(payload), status_code
 
 
@@ -1,7 +1,8 @@
+import json
 import os
+import subprocess
 
 import requests
-from dotenv import load_dotenv
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
@@ -10,12 +11,24 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
-# Robust Environment Loading
-script_dir = os.path.dirname(os.path.abspath(__file__))
-env_file_path = os.path.join(os.path.dirname(script_dir), ".envvars")
-print(f"Loading configuration from: {env_file_path}")
-load_dotenv(env_file_path)
-
+import repo_paths  # noqa: F401
+from load_chrome import (
+    apply_lean_options,
+    block_requests,
+    launch_with_cached_driver,
+    lean_enabled,
+    prime_lean_profile,
+)
+import metrics
+from receipt_cache import file_digest
+import setup
+from upload_journal import (
+    DELETED,
+    PARSED,
+    SUBMITTED,
+    UPLOADING,
+    UploadJournal,
+)
 
 def initialize_chrome_driver():
     """
@@ -33,11 +46,18 @@ def initialize_chrome_driver():
     print(f"Initializing Chrome with profile: {profile_name} at {chrome_profile_path}")
 
     options = Options()
-
-    # Profile Binding
-    options.add_argument(f"--user-data-dir={chrome_profile_path}")
-    options.add_argument(f"--profile-directory={profile_name}")
-    options.add_argument("--disable-extensions")
+    lean = lean_enabled()
+
+    # Profile Binding; a lean run uses a primed headless copy instead of the real profile
+    if lean:
+        options.add_argument(f"--user-data-dir={prime_lean_profile(chrome_profile_path, profile_name)}")
+        options.add_argument("--profile-directory=Default")
+        # Stays headed: the claim is submitted by hand in this window.
+        apply_lean_options(options, headless=False)
+    else:
+        options.add_argument(f"--user-data-dir={chrome_profile_path}")
+        options.add_argument(f"--profile-directory={profile_name}")
+        options.add_argument("--disable-extensions")
 
     # Standard Windows Communication Flag
     options.add_argument("--remote-allow-origins=*")
@@ -54,12 +74,17 @@ def initialize_chrome_driver():
     )  # Stops Windows from blocking the renderer
     # ----------------------------------------------------------------
 
-    # Automated Driver Fetching via webdriver-manager
-    service = Service(
-        executable_path=ChromeDriverManager().install(), log_output="chromedriver.log"
-    )
+    def launch(driver_path):
+        service = Service(
+            executable_path=driver_path,
+            log_output=subprocess.DEVNULL if lean else "chromedriver.log",
+        )
+        return webdriver.Chrome(options=options, service=service)
 
-    driver = webdriver.Chrome(options=options, service=service)
+    # Automated Driver Fetching via webdriver-manager, only when no cached path is still valid
+    driver = launch_with_cached_driver(launch, lambda: ChromeDriverManager().install())
+    if lean:
+        block_requests(driver)
 
     # --- ADDED: Tell Python to load pages faster without waiting for heavy background scripts ---
     driver.page_load_strategy = "eager"
@@ -67,59 +92,116 @@ def initialize_chrome_driver():
     return driver
 
 
-def automate_pluxee_uploads(api_endpoint, target_directory):
+def iter_receipts(api_endpoint, target_directory):
     """
-    Fetches receipt data, fills the portal, waits for manual submission, and deletes the file.
+    Yields receipts from the API's NDJSON stream as the server parses them, so uploads can start
+    on the first receipt while the rest of the folder is still being extracted.
     """
-    print("Fetching receipt data from the local API...")
-    try:
-        # Safe URL Encoding via the 'params' argument
-        response = requests.get(api_endpoint, params={"directory": target_directory})
+    # Safe URL Encoding via the 'params' argument
+    with requests.get(
+        api_endpoint, params={"directory": target_directory, "stream": "1"}, stream=True
+    ) as response:
         response.raise_for_status()
-        receipt_data = response.json().get("receipts", [])
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
+def delete_receipt(journal, digest, file_path):
+    filename = os.path.basename(file_path)
+    try:
+        os.remove(file_path)
+        journal.record(digest, file_path, DELETED)
+        print(f"Success: Permanently deleted '{filename}'.")
     except Exception as e:
-        print(f"Failed to fetch data from API: {e}")
-        return
+        print(f"Warning: Could not delete '{filename}'. Error: {e}")
 
-    if not receipt_data:
-        print("No receipts found or returned by the API.")
-        return
 
+def automate_pluxee_uploads(api_endpoint, target_directory):
+    """
+    Fetches receipt data, fills the portal, waits for manual submission, and deletes the file.
+    """
     pluxee_url = os.getenv("PLUXEE_URL")
     if not pluxee_url:
         raise ValueError("PLUXEE_URL is not set in the environment variables.")
+    # Mobikwik screenshots are claimed on the mobile bill form, when one is configured.
+    form_urls = {"Rapido": pluxee_url, "Mobikwik": os.getenv("PLUXEE_MOBILE_URL")}
 
-    driver = initialize_chrome_driver()
-    wait = WebDriverWait(driver, 300)
+    print("Streaming receipt data from the local API...")
+    journal = UploadJournal()
+    retry_inflight = os.getenv("RETRY_INFLIGHT", "False").upper() == "TRUE"
+    driver = None
+    index = 0
 
     try:
-        for index, receipt in enumerate(receipt_data, start=1):
+        for index, receipt in enumerate(iter_receipts(api_endpoint, target_directory), start=1):
             amount = receipt.get("amount")
             file_path = receipt.get("exact_file_path")
             filename = os.path.basename(file_path)
+            form_url = form_urls.get(receipt.get("type", "Rapido"))
 
             if amount in ("Not Found", "Error", "N/A", ""):
+                print(f"[{index}] Skipping {filename} - Invalid amount.")
+                metrics.increment("receipts_skipped", reason="invalid_amount")
+                continue
+            if not form_url:
+                print(f"[{index}] Skipping {filename} - No claim form for {receipt.get('type')} receipts.")
+                metrics.increment("receipts_skipped", reason="no_form")
+                continue
+
+            try:
+                digest = file_digest(file_path)
+            except OSError as e:
+                print(f"[{index}] Skipping {filename} - Could not read it: {e}")
+                metrics.increment("receipts_skipped", reason="unreadable")
+                continue
+
+            state = journal.state(digest)
+            if state == SUBMITTED:
+                # Submitted by a previous run that stopped before deleting the file.
+                print(f"[{index}] {filename} was already submitted, finishing its deletion.")
+                delete_receipt(journal, digest, file_path)
+                continue
+            if state == DELETED:
+                print(f"[{index}] Skipping {filename} - Already submitted and deleted.")
+                metrics.increment("receipts_skipped", reason="finished")
+                continue
+            if state == UPLOADING and not retry_inflight:
                 print(
-                    f"[{index}/{len(receipt_data)}] Skipping {filename} - Invalid amount."
+                    f"[{index}] Skipping {filename} - A previous run stopped mid-upload. "
+                    "Check the portal, then rerun with RETRY_INFLIGHT=TRUE."
                 )
+                metrics.increment("receipts_skipped", reason="inflight")
                 continue
 
-            print(f"\n--- Processing Receipt {index} of {len(receipt_data)} ---")
+            if driver is None:
+                with metrics.span("browser_start"):
+                    driver = initialize_chrome_driver()
+                wait = WebDriverWait(driver, 300)
+
+            print(f"\n--- Processing Receipt {index} ---")
             print(f"File: {filename} | Amount: ₹{amount}")
+            if receipt.get("type") == "Mobikwik":
+                print(f"Mobile number: {receipt.get('mobile_number')} (select it on the form)")
+
+            journal.record(digest, file_path, UPLOADING)
 
             # Navigate to the portal
-            driver.get(pluxee_url)
+            with metrics.span("upload_step", step="open_form"):
+                driver.get(form_url)
 
             # Wait for the amount input field and populate it
-            amount_input = wait.until(
-                EC.visibility_of_element_located((By.ID, "claim-amount"))
-            )
-            amount_input.clear()
-            amount_input.send_keys(str(amount))
+            with metrics.span("upload_step", step="set_amount"):
+                amount_input = wait.until(
+                    EC.visibility_of_element_located((By.ID, "claim-amount"))
+                )
+                amount_input.clear()
+                amount_input.send_keys(str(amount))
 
             # Locate the hidden file input and inject the exact path
-            file_input = driver.find_element(By.ID, "import-img")
-            file_input.send_keys(file_path)
+            with metrics.span("upload_step", step="upload_file"):
+                file_input = driver.find_element(By.ID, "import-img")
+                file_input.send_keys(file_path)
 
             # --- Human-in-the-Loop Pause & Safe Deletion ---
             print("\n*** ACTION REQUIRED ***")
@@ -127,27 +209,35 @@ def automate_pluxee_uploads(api_endpoint, target_directory):
             print("2. Manually click the 'Submit' button on the Pluxee portal.")
             print("3. Wait for the success confirmation on the portal.")
 
-            user_confirmation = input(
-                "\n4. Type 'y' and press ENTER if submitted successfully (this will DELETE the receipt), or just press ENTER to skip: "
-            )
+            with metrics.span("upload_step", step="manual_confirmation"):
+                user_confirmation = input(
+                    "\n4. Type 'y' and press ENTER if submitted successfully (this will DELETE the receipt), or just press ENTER to skip: "
+                )
 
             if user_confirmation.strip().lower() == "y":
-                try:
-                    os.remove(file_path)
-                    print(f"Success: Permanently deleted '{filename}'.")
-                except Exception as e:
-                    print(f"Warning: Could not delete '{filename}'. Error: {e}")
+                metrics.increment("uploads", result="submitted")
+                journal.record(digest, file_path, SUBMITTED)
+                delete_receipt(journal, digest, file_path)
             else:
+                metrics.increment("uploads", result="skipped")
+                journal.record(digest, file_path, PARSED)
                 print(
                     f"Notice: Skipped deletion for '{filename}'. Moving to the next file."
                 )
 
+    except requests.RequestException as e:
+        print(f"Failed to fetch data from API: {e}")
+
     finally:
-        print("\nAll receipts processed. Closing the browser gracefully.")
-        driver.quit()
+        if index == 0:
+            print("No receipts found or returned by the API.")
+        if driver is not None:
+            print("\nAll receipts processed. Closing the browser gracefully.")
+            driver.quit()
 
 
 if __name__ == "__main__":
+    setup.load()
     LOCAL_API_URL = "http://127.0.0.1:5000/extract"
 
     RECEIPTS_DIRECTORY = os.getenv("RECEIPTS_DIRECTORY")
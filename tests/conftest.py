@@ -0,0 +1,6 @@
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# selena/ first: server/ has its own main.py, which tests load by path instead.
+sys.path[:0] = [os.path.join(REPO_DIR, "selena"), os.path.join(REPO_DIR, "server")]
@@ -0,0 +1,42 @@
+import base64
+import importlib.util
+import json
+import os
+
+import pytest
+
+pytest.importorskip("flask")
+
+SERVER_BETA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server_BETA")
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Loaded by path: server_BETA/ is its own import root, like server/.
+    monkeypatch.syspath_prepend(SERVER_BETA_DIR)
+    spec = importlib.util.spec_from_file_location(
+        "beta_server", os.path.join(SERVER_BETA_DIR, "server.py")
+    )
+    beta_server = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(beta_server)
+    (tmp_path / "notes.txt").write_text("not a receipt")
+    return beta_server.app.test_client(), str(tmp_path)
+
+
+def encoded(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+@pytest.mark.parametrize("cursor", ["NQ==", encoded([1, 2]), encoded(["x", "p"]), encoded([1]), "@@"])
+def test_malformed_cursor_is_rejected(client, cursor):
+    test_client, directory = client
+    response = test_client.get("/extract", query_string={"directory": directory, "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_valid_cursor_pages(client):
+    test_client, directory = client
+    response = test_client.get(
+        "/extract", query_string={"directory": directory, "cursor": encoded([-1.0, "/a"])}
+    )
+    assert response.status_code == 200
@@ -0,0 +1,47 @@
+from CommonTypes import Receipt, UploadType
+from dedup import DedupIndex
+
+
+def fuel(path, date="Aug 21st 2025, 9:41 AM", amount="120.50"):
+    return Receipt(
+        amount=amount,
+        path=path,
+        source="Koramangala, Bengaluru 560034",
+        destination="Indiranagar, Bengaluru 560038",
+        date=date,
+        upload_type=UploadType.fuel,
+    )
+
+
+def mobile(path, amount="299.00", number="9876543200"):
+    return Receipt(amount=amount, path=path, mobile_number=number, upload_type=UploadType.mobile)
+
+
+def test_same_content_is_a_duplicate():
+    index = DedupIndex()
+    assert index.check(mobile("a.jpeg"), "digest") is None
+    assert index.check(mobile("copy.jpeg"), "digest") == "a.jpeg"
+
+
+def test_repeat_recharges_to_one_number_are_kept():
+    index = DedupIndex()
+    assert index.check(mobile("june.jpeg"), "digest-1") is None
+    assert index.check(mobile("july.jpeg"), "digest-2") is None
+
+
+def test_identical_rides_on_one_day_at_different_times_are_kept():
+    index = DedupIndex()
+    assert index.check(fuel("morning.pdf", "Aug 21st 2025, 9:41 AM"), "digest-1") is None
+    assert index.check(fuel("evening.pdf", "Aug 21st 2025, 6:12 PM"), "digest-2") is None
+
+
+def test_re_exported_ride_is_a_duplicate():
+    index = DedupIndex()
+    assert index.check(fuel("ride.pdf"), "digest-1") is None
+    assert index.check(fuel("ride (1).pdf"), "digest-2") == "ride.pdf"
+
+
+def test_undated_ride_is_only_matched_by_content():
+    index = DedupIndex()
+    assert index.check(fuel("a.pdf", date=None), "digest-1") is None
+    assert index.check(fuel("b.pdf", date=None), "digest-2") is None
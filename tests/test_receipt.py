@@ -0,0 +1,13 @@
+from CommonTypes import Receipt, UploadType, to_paise
+
+
+def test_paise_round_up():
+    assert to_paise("12.34") == 1234
+    assert to_paise("12.341") == 1235
+    assert to_paise(12.001) == 1201
+    assert to_paise(None) is None
+
+
+def test_amount_rounds_up_to_the_next_rupee():
+    for text, rupees in (("12.001", 13), ("12.341", 13), ("12.00", 12), ("60", 60)):
+        assert Receipt(amount=text, path="r.pdf", upload_type=UploadType.fuel).amount == rupees
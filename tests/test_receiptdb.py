@@ -0,0 +1,40 @@
+from Receiptdb import ReceiptDB
+
+
+def ride(**fields):
+    return {
+        "path": "/receipts/p1.pdf",
+        "hash": "abc",
+        "type": "Rapido",
+        "amount": 120.5,
+        "date": "Aug 21st 2025, 9:41 AM",
+        "source": "Koramangala, Bengaluru 560034",
+        "destination": "Indiranagar, Bengaluru 560038",
+        **fields,
+    }
+
+
+def stored(db):
+    return db.list()[0]
+
+
+def test_reingest_updates_data_and_keeps_state(tmp_path):
+    db = ReceiptDB(tmp_path / "receipts.sqlite")
+    db.upsert_many([ride()])
+    db.upsert_many([{"path": "/receipts/p1.pdf", "state": "submitted"}])
+    db.upsert_many([ride(amount=99.0)])
+    receipt = stored(db)
+    assert receipt["amount"] == 99.0
+    assert receipt["state"] == "submitted"
+
+
+def test_state_only_update_keeps_stored_fields(tmp_path):
+    db = ReceiptDB(tmp_path / "receipts.sqlite")
+    db.upsert_many([ride()])
+    before = stored(db)
+    db.upsert_many([{"path": "/receipts/p1.pdf", "state": "submitted"}])
+    after = stored(db)
+    assert after["state"] == "submitted"
+    columns = ("hash", "type", "amount", "date", "date_ts", "source", "destination")
+    assert all(before[column] is not None for column in columns)
+    assert {column: after[column] for column in columns} == {column: before[column] for column in columns}
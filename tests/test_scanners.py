@@ -0,0 +1,65 @@
+import importlib.util
+import io
+import os
+
+from PIL import Image
+
+from CommonTypes import ReceiptType
+from scanners import is_screenshot, pool_sizes, sniff
+
+
+SYNTHETIC_CORPUS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "synthetic_corpus.py"
+)
+
+
+def synthetic_corpus():
+    spec = importlib.util.spec_from_file_location("synthetic_corpus", SYNTHETIC_CORPUS)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def image_bytes(size, image_format):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "white").save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def test_pool_sizes_split_the_budget(monkeypatch):
+    monkeypatch.delenv("PDF_WORKERS", raising=False)
+    monkeypatch.delenv("OCR_WORKERS", raising=False)
+    assert pool_sizes(8) == {"pdf": 4, "ocr": 4}
+    assert pool_sizes(5) == {"pdf": 3, "ocr": 2}
+    assert pool_sizes(1) == {"pdf": 1, "ocr": 1}
+
+
+def test_portrait_images_are_screenshots():
+    assert is_screenshot(image_bytes((1080, 1400), "PNG"))
+    assert is_screenshot(image_bytes((1080, 1400), "JPEG"))
+
+
+def test_landscape_images_are_not_claimed(tmp_path):
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(image_bytes((1600, 1200), "JPEG"))
+    assert not is_screenshot(image_bytes((1600, 1200), "PNG"))
+    assert sniff(photo) is None
+
+
+def test_sniff_routes_screenshots_to_ocr(tmp_path):
+    screenshot = tmp_path / "recharge"
+    screenshot.write_bytes(image_bytes((720, 1600), "PNG"))
+    scanner = sniff(screenshot)
+    assert scanner.receipt_type == ReceiptType.Mobikwik
+    assert scanner.pool == "ocr"
+
+
+def test_only_pdfs_with_rapido_text_are_claimed(tmp_path, monkeypatch):
+    monkeypatch.setenv("TEXT_CACHE", "False")
+    corpus = synthetic_corpus()
+    receipt = tmp_path / "ride"
+    receipt.write_bytes(corpus.rapido_receipt(1)[0])
+    invoice = tmp_path / "invoice.pdf"
+    invoice.write_bytes(corpus.pdf_bytes(["Tax Invoice", "Total 1,200.00"]))
+    assert sniff(receipt).receipt_type == ReceiptType.Rapido
+    assert sniff(invoice) is None
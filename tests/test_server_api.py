@@ -0,0 +1,33 @@
+import importlib.util
+import os
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient  # noqa: E402
+
+SERVER_MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server", "main.py")
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # server/main.py shares its module name with selena/main.py, so it is loaded by path.
+    monkeypatch.setenv("RECEIPT_DB_PATH", str(tmp_path / "receipts.sqlite"))
+    spec = importlib.util.spec_from_file_location("server_main", SERVER_MAIN)
+    server_main = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(server_main)
+    return TestClient(server_main.app)
+
+
+def test_malformed_cursor_is_rejected(client):
+    assert client.get("/receipts", params={"cursor": "abc"}).status_code == 422
+    assert client.get("/receipts", params={"cursor": "0"}).status_code == 200
+
+
+def test_malformed_date_cursor_is_rejected(client):
+    for cursor in ("abc", "1:2:3", "x:1", "1.5:y"):
+        response = client.get("/receipts", params={"since": "2025-08-01", "cursor": cursor})
+        assert response.status_code == 422
+    response = client.get("/receipts", params={"since": "2025-08-01", "cursor": "1756000000.0:3"})
+    assert response.status_code == 200
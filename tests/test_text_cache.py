@@ -0,0 +1,27 @@
+import pdf_text
+from text_cache import TextCache
+
+
+def fake_pages(*pages):
+    return lambda path, max_pages=None: ((text, i == len(pages) - 1) for i, text in enumerate(pages))
+
+
+def test_read_stops_early_only_when_pages_are_left(monkeypatch):
+    monkeypatch.setitem(pdf_text.PAGE_ITERATORS, "pdfplumber", fake_pages("Fare 10", "Terms"))
+    assert pdf_text.read_text("r.pdf", [r"Fare"], "pdfplumber", None) == ("Fare 10\n", True)
+    assert pdf_text.read_text("r.pdf", [r"Terms"], "pdfplumber", None) == ("Fare 10\nTerms\n", False)
+
+
+def test_read_without_patterns_is_never_partial(monkeypatch):
+    monkeypatch.setitem(pdf_text.PAGE_ITERATORS, "pdfplumber", fake_pages("Fare 10", "Terms"))
+    assert pdf_text.read_text("r.pdf", (), "pdfplumber", None) == ("Fare 10\nTerms\n", False)
+
+
+def test_total_tracks_puts_replacements_and_evictions(tmp_path):
+    cache = TextCache(tmp_path / "text.sqlite", max_bytes=400)
+    for index in range(20):
+        cache.put(f"digest{index}", "pdf", f"receipt {index} " * 20)
+        cache.put(f"digest{index}", "pdf", f"receipt {index} " * 10)
+        assert cache.total == cache.total_bytes()
+    assert cache.total <= 400
+    assert TextCache(tmp_path / "text.sqlite", max_bytes=400).total == cache.total